@@ -1,67 +1,892 @@
 import sounddevice as sd
 import numpy as np
 import threading
-from pathlib import Path
+import queue
+import math
+import os
+import tempfile
 import wave
-from typing import Optional
+from contextlib import nullcontext
+from typing import Callable, List, Optional, Tuple
 from config_loader import Config
 
-class AudioRecorder:
+# Whisper models expect 16 kHz mono float32 input
+WHISPER_SAMPLE_RATE = 16000
+# Audio the encoder sees in one pass; shorter input is padded up to it
+WHISPER_WINDOW_SECONDS = 30
+# Soft limiting starts this far below full scale
+LIMITER_KNEE = 0.9
+# Captured samples this loud are counted as clipped by the device
+CLIP_LEVEL = 0.999
+# Normalization keeps the background noise below this share of audio.silence_threshold;
+# under half, where the VAD starts counting noisy frames as unvoiced speech
+NOISE_HEADROOM = 0.35
+
+def to_whisper_format(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Downmix to mono and resample to 16 kHz float32"""
+    if audio.ndim > 1:
+        # A single channel is just a view; only real downmixing allocates
+        audio = audio[:, 0] if audio.shape[1] == 1 else audio.mean(axis=1)
+
+    if sample_rate != WHISPER_SAMPLE_RATE:
+        from scipy.signal import resample_poly
+        divisor = math.gcd(WHISPER_SAMPLE_RATE, sample_rate)
+        audio = resample_poly(audio, WHISPER_SAMPLE_RATE // divisor, sample_rate // divisor)
+
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+def load_wav(path: str) -> np.ndarray:
+    """
+    Read a PCM WAV file into a buffer for Transcriber.transcribe_array
+
+    Returns:
+        float32 mono samples at 16 kHz
+    """
+    with wave.open(str(path), 'rb') as wf:
+        width = wf.getsampwidth()
+        channels = wf.getnchannels()
+        sample_rate = wf.getframerate()
+        frames = wf.readframes(wf.getnframes())
+
+    if width == 1:
+        audio = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        audio = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768
+    elif width == 4:
+        audio = np.frombuffer(frames, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width * 8} bits")
+
+    return to_whisper_format(audio.reshape(-1, channels), sample_rate)
+
+class VoiceActivityDetector:
+    """
+    Frame-based speech detector for 16 kHz mono buffers.
+
+    A frame counts as speech when its mean absolute amplitude reaches
+    audio.silence_threshold, or when it reaches half of that with a high
+    zero-crossing rate (unvoiced consonants such as "s" and "f"). Speech is
+    extended by a hangover period so short gaps between words stay intact.
+    """
+
     def __init__(self):
         self.config = Config()
-        self.recording = False
-        self.audio_data = []
+
+    @property
+    def settings(self):
+        return self.config.vad
+
+    def _frame_length(self) -> int:
+        return max(1, int(WHISPER_SAMPLE_RATE * self.settings['frame_ms'] / 1000))
+
+    def speech_mask(self, audio: np.ndarray) -> np.ndarray:
+        """Return one boolean per frame, True where speech (or hangover) was detected"""
+        frame = self._frame_length()
+        n_frames = audio.size // frame
+        if n_frames == 0:
+            return np.zeros(0, dtype=bool)
+
+        frames = audio[:n_frames * frame].reshape(n_frames, frame)
+        energy = np.abs(frames).mean(axis=1)
+        zcr = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1) / frame
+
+        threshold = self.config.audio['silence_threshold']
+        speech = (energy >= threshold) | (
+            (energy >= threshold * 0.5) & (zcr >= self.settings['zcr_threshold'])
+        )
+
+        # Keep each speech frame "on" for the hangover period after it
+        hangover = int(self.settings['hangover_ms'] / self.settings['frame_ms'])
+        if hangover > 0 and speech.any():
+            speech = np.convolve(speech, np.ones(hangover + 1), mode='full')[:n_frames] > 0
+        return speech
+
+    def speech_bounds(self, audio: np.ndarray) -> Optional[Tuple[int, int]]:
+        """Return (start, end) sample offsets of the speech in audio, padded, or None"""
+        speech = np.flatnonzero(self.speech_mask(audio))
+        if speech.size == 0:
+            return None
+        frame = self._frame_length()
+        padding = int(WHISPER_SAMPLE_RATE * self.settings['padding_ms'] / 1000)
+        start = max(0, speech[0] * frame - padding)
+        end = min(audio.size, (speech[-1] + 1) * frame + padding)
+        return int(start), int(end)
+
+    def trim(self, audio: np.ndarray) -> np.ndarray:
+        """Drop leading and trailing non-speech; returns an empty array if there is no speech"""
+        bounds = self.speech_bounds(audio)
+        if bounds is None:
+            return audio[:0]
+        return audio[bounds[0]:bounds[1]]
+
+    def split(self, audio: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        Split a recording at pauses
+
+        Returns:
+            (start, end) sample ranges covering the speech in audio, cut in the
+            middle of every pause of at least vad.min_pause seconds. Ranges
+            without speech are dropped.
+        """
+        speech = self.speech_mask(audio)
+        if not speech.any():
+            return []
+
+        frame = self._frame_length()
+        min_pause = max(1, int(self.settings['min_pause'] * 1000 / self.settings['frame_ms']))
+
+        # Locate runs of non-speech frames as [start, end) frame indices
+        padded = np.concatenate(([True], speech, [True])).astype(np.int8)
+        edges = np.diff(padded)
+        pause_starts = np.flatnonzero(edges == -1)
+        pause_ends = np.flatnonzero(edges == 1)
+        long_pauses = (pause_ends - pause_starts) >= min_pause
+
+        cuts = [0]
+        for start, end in zip(pause_starts[long_pauses], pause_ends[long_pauses]):
+            cuts.append(int((start + end) // 2) * frame)
+        cuts.append(audio.size)
+
+        ranges = []
+        for start, end in zip(cuts[:-1], cuts[1:]):
+            bounds = self.speech_bounds(audio[start:end])
+            if bounds is not None:
+                ranges.append((start + bounds[0], start + bounds[1]))
+        return ranges
+
+    def decode_ranges(self, audio: np.ndarray,
+                      max_seconds: float = WHISPER_WINDOW_SECONDS) -> List[Tuple[int, int]]:
+        """
+        Plan the decode calls for a recording
+
+        Each call costs at least one full encoder window, so a recording that
+        fits in max_seconds is only trimmed, and a longer one is split at
+        pauses into pieces merged back together up to max_seconds.
+
+        Returns:
+            (start, end) sample ranges, in order; empty if there is no speech
+        """
+        limit = int(max_seconds * WHISPER_SAMPLE_RATE)
+        if audio.size <= limit:
+            bounds = self.speech_bounds(audio)
+            return [bounds] if bounds is not None else []
+
+        ranges = []
+        for start, end in self.split(audio):
+            if ranges and end - ranges[-1][0] <= limit:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+
+class CaptureBuffer:
+    """
+    Preallocated float32 store written by the audio callback only.
+
+    The callback copies each block into a preallocated array and then bumps
+    the frame count; it never allocates or takes a lock. Once the array is
+    half full, a helper thread allocates one twice the size and copies the
+    existing frames over, and the callback switches to it on its next write
+    after copying the few frames captured in the meantime.
+
+    Readers get zero-copy views of the frames written so far. Frames are
+    never moved or overwritten in an array once written, so a view stays valid
+    after the buffer has grown.
+    """
+
+    def __init__(self, channels: int, initial_frames: int):
+        self.channels = channels
+        self.overflows = 0  # times the callback had to allocate because growth was late
+        self._data = np.zeros((max(1, initial_frames), channels), dtype=np.float32)
+        self._frames = 0
+        self._next = None  # (bigger array, frames already copied into it)
+        self._grow = threading.Event()
+        self._closed = False
+        threading.Thread(target=self._grower, daemon=True).start()
+
+    def __len__(self) -> int:
+        return self._frames
+
+    def write(self, indata: np.ndarray):
+        """Append a block; must only be called from the (single) producer thread"""
+        frames = self._frames
+        n = len(indata)
+        data = self._data
+
+        if self._next is not None:
+            bigger, copied = self._next
+            self._next = None
+            if len(bigger) > len(data):  # Stale if the fallback below already grew past it
+                bigger[copied:frames] = data[copied:frames]
+                self._data = data = bigger
+
+        if frames + n > len(data):
+            # The helper didn't keep up; grow here rather than drop audio
+            self.overflows += 1
+            bigger = np.zeros((max(2 * len(data), frames + n), self.channels), dtype=np.float32)
+            bigger[:frames] = data[:frames]
+            self._data = data = bigger
+
+        data[frames:frames + n] = indata
+        # Publish only after the samples are in place
+        self._frames = frames + n
+
+        if self._frames * 2 >= len(data) and self._next is None:
+            self._grow.set()
+
+    def _grower(self):
+        while True:
+            self._grow.wait()
+            self._grow.clear()
+            if self._closed:
+                return
+            if self._next is not None:
+                continue
+            frames = self._frames
+            data = self._data
+            bigger = np.zeros((2 * len(data), self.channels), dtype=np.float32)
+            bigger[:frames] = data[:frames]
+            self._next = (bigger, frames)
+
+    def view(self, start: int = 0) -> np.ndarray:
+        """Frames written so far from start on, as a (frames, channels) view without copying"""
+        # Read the count before the array: any array seen afterwards holds at least that many frames
+        frames = self._frames
+        return self._data[start:frames]
+
+    def close(self):
+        """Stop the helper thread; existing views stay valid"""
+        self._closed = True
+        self._grow.set()
+
+
+class PrerollBuffer:
+    """
+    Fixed-size ring of the most recent audio, kept while no recording runs.
+
+    Written and drained only on the audio thread, so it needs no locking and
+    never allocates after construction.
+    """
+
+    def __init__(self, channels: int, frames: int):
+        self._data = np.zeros((max(1, frames), channels), dtype=np.float32)
+        self._pos = 0
+        self._filled = 0
+
+    def write(self, indata: np.ndarray):
+        size = len(self._data)
+        n = len(indata)
+        if n >= size:
+            self._data[:] = indata[-size:]
+            self._pos = 0
+        else:
+            first = min(n, size - self._pos)
+            self._data[self._pos:self._pos + first] = indata[:first]
+            self._data[:n - first] = indata[first:]
+            self._pos = (self._pos + n) % size
+        self._filled = min(size, self._filled + n)
+
+    def drain_into(self, buffer: CaptureBuffer):
+        """Append the buffered audio, oldest first, to buffer and empty the ring"""
+        if self._filled == len(self._data):
+            buffer.write(self._data[self._pos:])
+        if self._pos:
+            buffer.write(self._data[max(0, self._pos - self._filled):self._pos])
+        self._pos = 0
+        self._filled = 0
+
+
+class ScratchBuffer:
+    """
+    Reusable float32 work array for per-block math on the audio thread.
+
+    Only allocates when a block larger than any before arrives, which in
+    practice means once, on the first block.
+    """
+
+    def __init__(self, frames: int = 4096):
+        self._data = np.empty(frames, dtype=np.float32)
+
+    def like(self, block: np.ndarray) -> np.ndarray:
+        """A view with block's shape, to be used as out= for block's math"""
+        if block.size > self._data.size:
+            self._data = np.empty(2 * block.size, dtype=np.float32)
+        return self._data[:block.size].reshape(block.shape)
+
+
+class AudioConditioner:
+    """
+    Turns a recording into Whisper's 16 kHz mono float32 while it is captured.
+
+    A helper thread picks up what the audio callback wrote every
+    conditioning.interval seconds: it downmixes, resamples with a polyphase
+    filter, removes DC offset, normalizes the gain and soft-limits peaks.
+    Each chunk is resampled with enough input on either side that the result
+    equals resampling the whole recording at once, so at stop only the last
+    fraction of a second is left to convert.
+
+    The gain starts at 1 and only moves on chunks that contain speech by
+    the VAD's own measure (frames at audio.silence_threshold before any
+    gain). It never lifts the measured noise floor past NOISE_HEADROOM of
+    the threshold, so the VAD still finds the silence before, between and
+    after speech.
+    """
+
+    def __init__(self, source: CaptureBuffer, sample_rate: int, initial_frames: int):
+        """
+        Args:
+            source: The recording's capture buffer, at sample_rate
+            sample_rate: Capture rate in Hz
+            initial_frames: Output frames to preallocate
+        """
+        config = Config()
+        # Fixed for the whole recording, even if the config is reloaded meanwhile
+        self.settings = config.conditioning
+        self._threshold = config.audio['silence_threshold']
+        self._frame = max(1, int(config.vad['frame_ms'] * WHISPER_SAMPLE_RATE / 1000))
+        self.source = source
+        divisor = math.gcd(WHISPER_SAMPLE_RATE, sample_rate)
+        self._up = WHISPER_SAMPLE_RATE // divisor
+        self._down = sample_rate // divisor
+        self._context = 0
+        if self._up != self._down:
+            # resample_poly's filter reaches 10 * max(up, down) upsampled samples each way
+            reach = -(-10 * max(self._up, self._down) // self._up) + 1
+            # Chunks start on multiples of down, so output samples line up across chunks
+            self._context = -(-reach // self._down) * self._down
+        self._position = 0  # Input frames converted so far
+        self._dc_state = np.zeros(1)
+        self._dc_pole = math.exp(-2 * math.pi * self.settings['dc_cutoff'] / WHISPER_SAMPLE_RATE)
+        self._gain = 1.0
+        self._peak = 0.0  # Loudest speech so far
+        self._noise = 0.0  # Loudest noise floor so far, as a frame's mean absolute level
+        self.clipped = 0
+        self.output = CaptureBuffer(1, initial_frames)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def view(self) -> np.ndarray:
+        """Conditioned audio so far; lags the capture by up to one interval"""
+        return self.output.view()[:, 0]
+
+    def finish(self) -> np.ndarray:
+        """Convert what is left once capture has stopped; returns the whole recording"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._step(final=True)
+        self.output.close()
+        if self.clipped:
+            print(f"Input clipped in {self.clipped} samples, consider lowering the microphone gain")
+        return self.view()
+
+    def _run(self):
+        while not self._stop.wait(self.settings['interval']):
+            try:
+                self._step()
+            except Exception as e:
+                # finish() converts whatever is left, so giving up here only costs time at stop
+                print(f"Audio conditioning failed: {e}")
+                return
+
+    def _step(self, final: bool = False):
+        raw = self.source.view()
+        start = self._position
+        if final or not self._context:
+            end = len(raw)
+        else:
+            # Hold back what the filter still needs future input for
+            end = (len(raw) - self._context) // self._down * self._down
+        if end <= start:
+            return
+        first = max(0, start - self._context)
+        last = len(raw) if final else min(len(raw), end + self._context)
+
+        self.clipped += int(np.count_nonzero(np.abs(raw[start:end]) >= CLIP_LEVEL))
+        block = raw[first:last]
+        audio = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+        if self._context:
+            from scipy.signal import resample_poly
+            audio = resample_poly(audio, self._up, self._down)
+            skip = (start - first) * self._up // self._down
+            audio = audio[skip:] if final else audio[skip:skip + (end - start) * self._up // self._down]
+        # Always a copy: the rest works in place and block may be a view of the capture
+        audio = np.array(audio, dtype=np.float32)
+        if not audio.size:
+            self._position = end
+            return
+
+        settings = self.settings
+        if settings['dc_cutoff']:
+            from scipy.signal import lfilter
+            # One-pole high-pass, its state carried from chunk to chunk
+            filtered, self._dc_state = lfilter(
+                [1.0, -1.0], [1.0, -self._dc_pole], audio, zi=self._dc_state
+            )
+            audio[:] = filtered
+        if settings['normalize']:
+            self._normalize(audio)
+        if settings['limit']:
+            loud = np.abs(audio) > LIMITER_KNEE
+            if loud.any():
+                over = np.abs(audio[loud]) - LIMITER_KNEE
+                # Approaches full scale without reaching it
+                audio[loud] = np.sign(audio[loud]) * (
+                    LIMITER_KNEE + (1 - LIMITER_KNEE) * np.tanh(over / (1 - LIMITER_KNEE))
+                )
+        self.output.write(audio.reshape(-1, 1))
+        self._position = end
+
+    def _normalize(self, audio: np.ndarray):
+        """Apply the gain in place, adapting it if this chunk has speech in it"""
+        frames = audio.size // self._frame
+        gain = self._gain
+        if frames:
+            levels = np.abs(audio[:frames * self._frame]).reshape(frames, self._frame).mean(axis=1)
+            quiet = levels[levels < self._threshold]
+            if quiet.size:
+                self._noise = max(self._noise, float(np.median(quiet)))
+            if quiet.size < frames:
+                self._peak = max(self._peak, float(np.abs(audio).max()))
+                gain = min(self.settings['max_gain'], self.settings['target_peak'] / self._peak)
+                if self._noise:
+                    # Never below 1 on account of noise: attenuating would not help the VAD
+                    gain = min(gain, max(1.0, self._threshold * NOISE_HEADROOM / self._noise))
+        if gain != self._gain:
+            # Ramp rather than step, so gain changes don't click
+            audio *= np.linspace(self._gain, gain, audio.size, dtype=np.float32)
+            self._gain = gain
+        elif gain != 1.0:
+            audio *= gain
+
+
+class Subscription:
+    """
+    Bounded queue of blocks (or values derived from them) fed by AudioCapture.
+
+    When the consumer falls behind, new items are dropped and counted
+    instead of blocking the audio thread.
+    """
+
+    def __init__(self, name: str, maxsize: int, transform: Optional[Callable[[np.ndarray], object]] = None):
+        self.name = name
+        self.dropped = 0
+        self.queue = queue.Queue(maxsize=maxsize)
+        # PortAudio reuses indata after the callback, so raw blocks must be copied
+        self._transform = transform or np.copy
+
+    def _publish(self, indata: np.ndarray):
+        try:
+            self.queue.put_nowait(self._transform(indata))
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout: Optional[float] = None):
+        return self.queue.get(timeout=timeout)
+
+    def get_nowait(self):
+        return self.queue.get_nowait()
+
+
+class AudioCapture:
+    """
+    The one input stream on the audio device, shared by everything that listens.
+
+    Sinks are called directly on the audio thread with every block and must
+    be cheap and must not block (the recorder's CaptureBuffer, silence
+    tracking). Subscriptions get their own bounded queue and count what they
+    drop (level meter, anything slower). The stream is opened by the first
+    start() and closed by the matching last stop().
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self.stream = None
+        # (sample rate, channels) the open stream delivers
+        self.format: Optional[Tuple[int, int]] = None
+        self._users = 0
+        # Replaced, never mutated, so the callback can iterate without a lock
+        self._sinks: Tuple[Callable[[np.ndarray, int], None], ...] = ()
+        self._subscriptions: Tuple[Subscription, ...] = ()
         self._lock = threading.Lock()
 
-    def _audio_callback(self, indata, frames, time, status):
+    def _callback(self, indata, frames, time, status):
         """Callback for sounddevice's InputStream"""
         if status:
             print(f"Status: {status}")
+        for sink in self._sinks:
+            sink(indata, frames)
+        for subscription in self._subscriptions:
+            subscription._publish(indata)
+
+    def add_sink(self, sink: Callable[[np.ndarray, int], None]):
+        with self._lock:
+            self._sinks += (sink,)
+
+    def remove_sink(self, sink: Callable[[np.ndarray, int], None]):
+        with self._lock:
+            self._sinks = tuple(s for s in self._sinks if s != sink)
+
+    def subscribe(self, name: str, maxsize: int = 32,
+                  transform: Optional[Callable[[np.ndarray], object]] = None) -> Subscription:
+        """
+        Receive blocks through a bounded queue
+
+        Args:
+            name: Shown in drop statistics
+            maxsize: Items kept for a slow consumer before new ones are dropped
+            transform: Runs on the audio thread and turns each block into the
+                queued item (e.g. a level); keep it cheap. Defaults to a copy.
+        """
+        subscription = Subscription(name, maxsize, transform)
+        with self._lock:
+            self._subscriptions += (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions = tuple(s for s in self._subscriptions if s is not subscription)
+        if subscription.dropped:
+            print(f"Audio subscriber '{subscription.name}' dropped {subscription.dropped} blocks")
+
+    def start(self):
+        """Open the input stream unless it is already running"""
+        with self._lock:
+            self._users += 1
+            if self.stream is not None:
+                return
+            try:
+                self._open()
+            except Exception:
+                self._users -= 1
+                raise
+
+    def _open(self):
+        """Open the stream with the current audio settings; call with the lock held"""
+        audio = self.config.audio
+        stream = sd.InputStream(
+            channels=audio['channels'],
+            samplerate=audio['sample_rate'],
+            dtype='float32',
+            callback=self._callback
+        )
+        stream.start()
+        self.stream = stream
+        self.format = (audio['sample_rate'], audio['channels'])
+
+    def reopen(self):
+        """Close and reopen a running stream, so it delivers the current audio settings"""
+        with self._lock:
+            if self.stream is None:
+                return
+            stream, self.stream = self.stream, None
+            stream.stop()
+            stream.close()
+            self._open()
+
+    def stop(self):
+        """Release one start(); the stream closes when nobody needs it any more"""
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            if self._users or self.stream is None:
+                return
+            stream, self.stream = self.stream, None
+            self.format = None
+        stream.stop()
+        stream.close()
+
+
+class AudioRecorder:
+    def __init__(self, capture: Optional[AudioCapture] = None):
+        self.config = Config()
+        # Shared with the visualizer (and anyone else listening) when given
+        self.capture = capture or AudioCapture()
+        self.recording = False
+        self.buffer: Optional[CaptureBuffer] = None
+        # Converts self.buffer to 16 kHz mono during the recording (audio.conditioning)
+        self.conditioner: Optional[AudioConditioner] = None
+        self.last_debug_path = None
+        # Optional latency.Trace of the utterance being recorded
+        self.trace = None
+        self.vad = VoiceActivityDetector()
+        # Called (from a helper thread) once audio.timeout seconds of silence were captured
+        self.on_timeout: Optional[Callable[[], None]] = None
+        self._silent_frames = 0
+        self._timeout_fired = False
+        # Warm-stream mode (audio.preroll): the stream stays open between recordings
+        self.preroll: Optional[PrerollBuffer] = None
+        self._preroll_pending = False
+        self._warm = False
+        self._idle_timer: Optional[threading.Timer] = None
+        self._warm_lock = threading.Lock()
+        # Audio settings changed during a recording; the warm stream reopens after it
+        self._reopen_pending = False
+        # Read on every block, so kept here rather than rebuilt from the config each time
+        self._scratch = ScratchBuffer()
+        self._cache_settings()
+
+    def _on_audio(self, indata, frames):
+        """AudioCapture sink, runs on the audio thread"""
         if self.recording:
-            with self._lock:
-                self.audio_data.append(indata.copy())
+            if self._preroll_pending:
+                # Prepend what was said just before the hotkey press
+                self._preroll_pending = False
+                preroll = self.preroll
+                if preroll is not None:
+                    preroll.drain_into(self.buffer)
+            self.buffer.write(indata)
+            self._track_silence(indata, frames)
+        else:
+            # Read once: apply_config may swap it out from another thread
+            preroll = self.preroll
+            if preroll is not None:
+                preroll.write(indata)
+
+    def _new_preroll(self) -> PrerollBuffer:
+        audio = self.config.audio
+        return PrerollBuffer(audio['channels'], int(self.config.preroll['seconds'] * audio['sample_rate']))
+
+    def _warm_up(self):
+        """Open the stream and keep it open, filling the pre-roll ring"""
+        if self._warm:
+            if self.capture.format != (self.config.audio['sample_rate'], self.config.audio['channels']):
+                # Settings changed since the stream was opened
+                self._reopen_warm()
+            return
+        self.preroll = self._new_preroll()
+        self.capture.add_sink(self._on_audio)
+        try:
+            self.capture.start()
+        except Exception:
+            self.capture.remove_sink(self._on_audio)
+            self.preroll = None
+            raise
+        self._warm = True
+
+    def _reopen_warm(self):
+        """Reopen the warm stream with the current settings; call with _warm_lock held"""
+        print("Reopening audio input with the new settings")  # Debug
+        # Audio of the old format must not end up in a buffer of the new one
+        self.preroll = None
+        self.capture.reopen()
+        self.preroll = self._new_preroll()
+
+    def _cache_settings(self):
+        """Copy what the audio callback needs out of the config"""
+        audio = self.config.audio
+        self._silence_threshold = audio['silence_threshold']
+        # None when auto_stop is off
+        self._timeout_frames = audio['timeout'] * audio['sample_rate'] if self.config.vad['auto_stop'] else None
+
+    def apply_config(self):
+        """
+        Pick up audio and VAD settings changed by Config.reload
+
+        A warm stream (audio.preroll) is reopened right away, or after the
+        recording in progress if there is one; otherwise the stream is
+        closed anyway and opens with the new settings next time. Turning
+        pre-roll off closes a warm stream the same way.
+        """
+        self._cache_settings()
+        audio = self.config.audio
+        with self._warm_lock:
+            if self._warm and not self.config.preroll['enabled']:
+                if not self.recording:  # Otherwise stop_recording closes it
+                    self._close_warm()
+                return
+            if not self._warm or self.capture.format == (audio['sample_rate'], audio['channels']):
+                return
+            if self.recording:
+                self._reopen_pending = True
+            else:
+                self._reopen_warm()
+
+    def _cool_down(self):
+        """Idle policy: close the warm stream if no recording started since"""
+        with self._warm_lock:
+            if not self._warm or self.recording:
+                return
+            print("Closing idle audio input")  # Debug
+            self._close_warm()
+
+    def _close_warm(self):
+        """Close the warm stream; call with _warm_lock held"""
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        self._warm = False
+        self.capture.remove_sink(self._on_audio)
+        self.capture.stop()
+        self.preroll = None
+
+    def _schedule_cool_down(self):
+        idle_timeout = self.config.preroll['idle_timeout']
+        if idle_timeout:
+            self._idle_timer = threading.Timer(idle_timeout, self._cool_down)
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    def warm_up(self):
+        """Open the input ahead of the first recording when audio.preroll is enabled"""
+        if not self.config.preroll['enabled']:
+            return
+        with self._warm_lock:
+            self._warm_up()
+        self._schedule_cool_down()
+
+    def _track_silence(self, indata, frames):
+        """Fire on_timeout after audio.timeout seconds of continuous silence"""
+        timeout_frames = self._timeout_frames
+        if self.on_timeout is None or self._timeout_fired or timeout_frames is None:
+            return
+        level = np.abs(indata, out=self._scratch.like(indata)).mean()
+        if level < self._silence_threshold:
+            self._silent_frames += frames
+        else:
+            self._silent_frames = 0
+        if self._silent_frames >= timeout_frames:
+            self._timeout_fired = True
+            # Never stop the stream from inside its own callback
+            threading.Thread(target=self.on_timeout, daemon=True).start()
 
     def start_recording(self):
         """Start recording audio from the default microphone"""
-        self.recording = True
-        self.audio_data = []
-        
-        # Create input stream
-        self.stream = sd.InputStream(
-            channels=self.config.audio['channels'],
-            samplerate=self.config.audio['sample_rate'],
-            callback=self._audio_callback
-        )
-        self.stream.start()
+        audio = self.config.audio
+        # A fresh buffer per recording, so views handed out earlier stay untouched
+        buffer_seconds = audio.get('buffer_seconds', 30)
+        self.buffer = CaptureBuffer(audio['channels'], int(buffer_seconds * audio['sample_rate']))
+        self.conditioner = None
+        if self.config.conditioning['enabled']:
+            self.conditioner = AudioConditioner(
+                self.buffer, audio['sample_rate'], int(buffer_seconds * WHISPER_SAMPLE_RATE)
+            )
+        self._silent_frames = 0
+        self._timeout_fired = False
 
-    def stop_recording(self) -> Optional[str]:
-        """Stop recording and save the audio to a WAV file"""
+        with self._warm_lock:
+            # A stream still warm from before pre-roll was turned off is used as is
+            warm = self._warm or self.config.preroll['enabled']
+            if warm:
+                if self._idle_timer is not None:
+                    self._idle_timer.cancel()
+                    self._idle_timer = None
+                # Reopening after an idle close has no pre-roll, later recordings do
+                self._warm_up()
+                self._preroll_pending = True
+                self.recording = True
+        if not warm:
+            self.capture.start()
+            if self.capture.format != (audio['sample_rate'], audio['channels']):
+                # Still open for someone else (the overlay) with settings from before a reload
+                try:
+                    self.capture.reopen()
+                except Exception:
+                    self.capture.stop()
+                    raise
+            self.recording = True
+            self.capture.add_sink(self._on_audio)
+
+        if self.conditioner is not None:
+            self.conditioner.start()
+
+    def stop_recording(self) -> Optional[np.ndarray]:
+        """
+        Stop recording and return the captured audio
+
+        Returns:
+            float32 mono buffer at 16 kHz, ready for Transcriber.transcribe_array,
+            or None if nothing was recorded
+        """
         if not self.recording:
             return None
 
         self.recording = False
-        self.stream.stop()
-        self.stream.close()
+        self._preroll_pending = False
+        if self._warm:
+            if self.config.preroll['enabled']:
+                # Keep listening for the next pre-roll until the idle timeout
+                self._schedule_cool_down()
+            else:
+                with self._warm_lock:
+                    self._close_warm()
+        else:
+            self.capture.remove_sink(self._on_audio)
+            self.capture.stop()
+        if self._reopen_pending:
+            with self._warm_lock:
+                self._reopen_pending = False
+                if self._warm:
+                    self._reopen_warm()
 
-        if not self.audio_data:
+        self.buffer.close()
+        if not len(self.buffer):
+            if self.conditioner is not None:
+                self.conditioner.finish()
             return None
 
-        # Combine all audio chunks
-        with self._lock:
-            audio = np.concatenate(self.audio_data, axis=0)
+        span = self.trace.span('concatenate') if self.trace else nullcontext({})
+        with span as fields:
+            if self.conditioner is not None:
+                # Most of it was converted while recording
+                audio = self.conditioner.finish()
+            else:
+                # Zero-copy for 16 kHz mono capture; otherwise one pass to convert
+                audio = self._to_whisper_format(self.buffer.view())
+            fields['audio_seconds'] = round(audio.size / WHISPER_SAMPLE_RATE, 3)
+        if audio.size == 0:
+            return None
+
+        # Only touch the disk when explicitly asked to
+        if self.config.audio.get('debug_wav', False):
+            self.last_debug_path = self.save_wav(audio)
+            print(f"Debug recording saved to {self.last_debug_path}")
+
+        return audio
+
+    def get_audio(self) -> np.ndarray:
+        """Return everything captured so far without stopping the recording"""
+        if self.buffer is None:
+            return np.zeros(0, dtype=np.float32)
+        if self.conditioner is not None:
+            # Already converted, apart from the last fraction of a second
+            return self.conditioner.view()
+        return self._to_whisper_format(self.buffer.view())
+
+    def _to_whisper_format(self, audio: np.ndarray) -> np.ndarray:
+        """Downmix to mono and resample to 16 kHz float32"""
+        return to_whisper_format(audio, self.config.audio['sample_rate'])
+
+    def save_wav(self, audio: np.ndarray, path: Optional[str] = None) -> str:
+        """
+        Write a 16 kHz float32 buffer to a 16-bit WAV file
+
+        Args:
+            audio: Buffer as returned by stop_recording
+            path: Destination path, a unique temporary file if omitted
+
+        Returns:
+            Path of the written file
+        """
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='voxtalkinux-', suffix='.wav')
+            os.close(fd)
 
-        # Save to temporary WAV file
-        temp_path = Path(__file__).parent / "temp_recording.wav"
-        with wave.open(str(temp_path), 'wb') as wf:
-            wf.setnchannels(self.config.audio['channels'])
+        with wave.open(str(path), 'wb') as wf:
+            wf.setnchannels(1)
             wf.setsampwidth(2)  # 16-bit audio
-            wf.setframerate(self.config.audio['sample_rate'])
-            wf.writeframes((audio * 32767).astype(np.int16).tobytes())
+            wf.setframerate(WHISPER_SAMPLE_RATE)
+            wf.writeframes((np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes())
 
-        return str(temp_path)
+        return str(path)
 
     def is_silent(self, audio_chunk, silence_threshold=None):
         """Check if an audio chunk is silent"""
         if silence_threshold is None:
             silence_threshold = self.config.audio['silence_threshold']
-        return np.abs(audio_chunk).mean() < silence_threshold 
\ No newline at end of file
+        return np.abs(audio_chunk).mean() < silence_threshold
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark and batch transcription over WAV files.
+
+    python bench.py bench CORPUS_DIR [--models tiny base] [--backends whisper faster-whisper]
+                                     [--output results.json] [--compare previous.json]
+    python bench.py transcribe FILE_OR_DIR... [--jobs N] [--write]
+    python bench.py idle [--seconds 10] [--gui] [--bare] [--max-cpu 0.5]
+    python bench.py render [--frames 1000]
+
+A benchmark corpus is a directory of WAV files, each with its reference
+transcript in a .txt file of the same name. Every model/backend combination
+runs in a fresh process so model load time and peak RSS are measured
+in isolation.
+
+`idle` measures what the service costs while nothing happens: CPU time
+and context switches of the whole process, with its background threads
+(pipeline, hotkey listener, config watcher, API) running, over a quiet
+period, optionally after the overlay has been shown and hidden once.
+--bare measures only the overlay's main loop, without a display. `render` times waveform
+frames of the overlay, including Tk's redraw (needs a display).
+"""
+
+import argparse
+import json
+import os
+import re
+import resource
+import sys
+import threading
+import time
+import multiprocessing as mp
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Only used in the pool processes
+_transcriber = None
+
+
+def find_wavs(paths: List[str]) -> List[Path]:
+    """Expand files and directories into a sorted list of WAV files"""
+    wavs = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            wavs.extend(sorted(path.rglob('*.wav')))
+        else:
+            wavs.append(path)
+    return wavs
+
+
+def load_corpus(directory: str) -> List[Tuple[Path, Optional[str]]]:
+    """Pair every WAV file in directory with its reference transcript, if any"""
+    corpus = []
+    for wav in find_wavs([directory]):
+        reference = wav.with_suffix('.txt')
+        corpus.append((wav, reference.read_text().strip() if reference.exists() else None))
+    return corpus
+
+
+def normalize(text: str) -> List[str]:
+    """Lowercase and strip punctuation so WER only counts word differences"""
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+
+def word_errors(reference: str, hypothesis: str) -> Tuple[int, int]:
+    """
+    Word-level edit distance
+
+    Returns:
+        (substitutions + deletions + insertions, number of reference words)
+    """
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    # Single-row Levenshtein over words
+    row = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        diagonal, row[0] = row[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            diagonal, row[j] = row[j], min(
+                row[j] + 1,
+                row[j - 1] + 1,
+                diagonal + (ref_word != hyp_word)
+            )
+    return row[-1], len(ref)
+
+
+def _apply_overrides(backend: Optional[str], model_size: Optional[str], threads: Optional[int]):
+    from config_loader import Config
+
+    overrides = {}
+    if backend:
+        overrides['backend'] = backend
+    if model_size:
+        overrides['model_size'] = model_size
+    if threads:
+        overrides['threads'] = threads
+    Config().override('whisper', **overrides)
+
+
+def _bench_run(backend: str, model_size: str, corpus: List[Tuple[Path, Optional[str]]]) -> Dict[str, Any]:
+    """Benchmark one backend/model combination; runs in its own process"""
+    from audio_recorder import load_wav, WHISPER_SAMPLE_RATE
+    from config_loader import Config
+    from transcriber import Transcriber
+
+    _apply_overrides(backend, model_size, None)
+    # Cached results would make every run after the first look instant
+    Config().override('cache', enabled=False)
+
+    start = time.monotonic()
+    transcriber = Transcriber()
+    load_seconds = time.monotonic() - start
+
+    files = []
+    errors = words = 0
+    for wav, reference in corpus:
+        audio = load_wav(wav)
+        start = time.monotonic()
+        text = transcriber.transcribe_array(audio)
+        wall = time.monotonic() - start
+        audio_seconds = audio.size / WHISPER_SAMPLE_RATE
+
+        entry = {
+            'file': str(wav),
+            'audio_seconds': round(audio_seconds, 3),
+            'wall_seconds': round(wall, 4),
+            'real_time_factor': round(wall / audio_seconds, 4) if audio_seconds else None,
+            'text': text
+        }
+        if reference is not None:
+            file_errors, file_words = word_errors(reference, text)
+            entry['wer'] = round(file_errors / file_words, 4) if file_words else None
+            errors += file_errors
+            words += file_words
+        files.append(entry)
+
+    latencies = [f['wall_seconds'] for f in files]
+    audio_total = sum(f['audio_seconds'] for f in files)
+    return {
+        'backend': backend,
+        'model_size': model_size,
+        'files': len(files),
+        'model_load_seconds': round(load_seconds, 3),
+        'audio_seconds': round(audio_total, 3),
+        'wall_seconds': round(sum(latencies), 3),
+        'real_time_factor': round(sum(latencies) / audio_total, 4) if audio_total else None,
+        'wer': round(errors / words, 4) if words else None,
+        'latency_p50': round(float(np.percentile(latencies, 50)), 4) if latencies else None,
+        'latency_p95': round(float(np.percentile(latencies, 95)), 4) if latencies else None,
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'per_file': files
+    }
+
+
+def _result_key(result: Dict[str, Any]) -> Tuple[str, str]:
+    return result['backend'], result['model_size']
+
+
+def print_summary(results: List[Dict[str, Any]], previous: Optional[List[Dict[str, Any]]] = None):
+    """Print one line per run, with deltas against a previous results file if given"""
+    baseline = {_result_key(r): r for r in previous or []}
+    columns = ['wer', 'real_time_factor', 'latency_p50', 'latency_p95', 'peak_rss_mb', 'model_load_seconds']
+    print(f"{'backend':<16}{'model':<10}" + ''.join(f'{c:>20}' for c in columns))
+    for result in results:
+        line = f"{result['backend']:<16}{result['model_size']:<10}"
+        old = baseline.get(_result_key(result), {})
+        for column in columns:
+            value = result[column]
+            cell = '-' if value is None else f'{value:g}'
+            if value is not None and old.get(column) is not None:
+                cell += f' ({value - old[column]:+.3g})'
+            line += f'{cell:>20}'
+        print(line)
+
+
+def bench(args):
+    from config_loader import Config
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"No WAV files found in {args.corpus}")
+
+    whisper = Config().whisper
+    backends = args.backends or [whisper['backend']]
+    models = args.models or [whisper['model_size']]
+
+    results = []
+    for backend in backends:
+        for model_size in models:
+            print(f"Benchmarking {backend} / {model_size} on {len(corpus)} files...")
+            # A fresh process per run keeps load time and peak RSS independent
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context('spawn')) as pool:
+                try:
+                    results.append(pool.submit(_bench_run, backend, model_size, corpus).result())
+                except Exception as e:
+                    print(f"  failed: {e}")
+
+    previous = None
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text())['results']
+    print_summary(results, previous)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            'created': time.time(),
+            'corpus': str(args.corpus),
+            'results': results
+        }, indent=2))
+        print(f"Results written to {args.output}")
+
+
+def _init_batch_worker(backend: Optional[str], model_size: Optional[str], threads: int):
+    global _transcriber
+    from transcriber import Transcriber
+
+    _apply_overrides(backend, model_size, threads)
+    _transcriber = Transcriber()
+
+
+def _batch_transcribe(path: Path) -> Tuple[Path, str]:
+    from audio_recorder import load_wav
+    return path, _transcriber.transcribe_array(load_wav(path))
+
+
+def transcribe(args):
+    wavs = find_wavs(args.paths)
+    if not wavs:
+        sys.exit("No WAV files given")
+
+    jobs = min(args.jobs or os.cpu_count() or 1, len(wavs))
+    # Split the cores between workers instead of letting each one use all of them
+    threads = max(1, (os.cpu_count() or 1) // jobs)
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=mp.get_context('spawn'),
+        initializer=_init_batch_worker,
+        initargs=(args.backend, args.model, threads)
+    ) as pool:
+        for path, text in pool.map(_batch_transcribe, wavs):
+            if args.write:
+                path.with_suffix('.txt').write_text(text + '\n')
+            else:
+                print(f"{path}\t{text}")
+
+
+def _usage() -> Tuple[float, int]:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime, usage.ru_nvcsw + usage.ru_nivcsw
+
+
+def idle(args):
+    service = None
+    if args.bare:
+        from visualization import RecordingVisualizer
+        visualizer = RecordingVisualizer()
+    else:
+        from voice_transcriber import VoiceTranscriber
+        service = VoiceTranscriber()
+        service.start_background()
+        visualizer = service.visualizer
+    measured = {}
+
+    def scenario():
+        if service is not None and not service.transcriber.ready:
+            # A model loading in this process would be counted as idle time
+            print("Waiting for the model to load...")
+            while not service.transcriber.ready:
+                time.sleep(0.5)
+        if args.gui:
+            # Get Tk initialized, then measure the state it is left in between recordings
+            visualizer.show()
+            time.sleep(1.0)
+            visualizer.hide()
+            time.sleep(0.5)
+        cpu, switches = _usage()
+        time.sleep(args.seconds)
+        end_cpu, end_switches = _usage()
+        measured.update(cpu=end_cpu - cpu, switches=end_switches - switches)
+        if service is not None:
+            service.stop_background()
+        visualizer.stop()
+
+    threading.Thread(target=scenario, daemon=True).start()
+    # The GUI loop has to own the main thread, as in voice_transcriber.py
+    visualizer.run()
+
+    cpu_percent = 100 * measured['cpu'] / args.seconds
+    print(f"idle for {args.seconds:g}s{' after showing the overlay' if args.gui else ''}: "
+          f"{measured['cpu'] * 1000:.1f} ms CPU ({cpu_percent:.3f}%), "
+          f"{measured['switches'] / args.seconds:.1f} context switches/s")
+    if args.max_cpu is not None and cpu_percent > args.max_cpu:
+        sys.exit(f"Idle CPU {cpu_percent:.3f}% is above the {args.max_cpu:g}% limit")
+
+
+def render(args):
+    from audio_recorder import AudioCapture
+    from visualization import RecordingVisualizer
+
+    # A capture that is never started: the overlay subscribes but no device is opened
+    visualizer = RecordingVisualizer(AudioCapture())
+    visualizer.show()
+    visualizer.process_commands()
+    visualizer.is_recording = False  # Stop its own animation loop; frames are driven below
+    visualizer.root.update()
+
+    times = []
+    for frame in range(args.frames):
+        # Sweep through quiet and loud levels
+        amplitude = 35 * (1 + np.sin(frame / 25))
+        start = time.perf_counter()
+        visualizer.animation_frame = frame
+        visualizer._draw_waveform(amplitude)
+        visualizer.root.update_idletasks()
+        times.append(time.perf_counter() - start)
+
+    visualizer.hide()
+    visualizer.process_commands()
+    times_ms = np.array(times) * 1000
+    print(f"{args.frames} frames: mean {times_ms.mean():.3f} ms, p50 {np.percentile(times_ms, 50):.3f} ms, "
+          f"p95 {np.percentile(times_ms, 95):.3f} ms, max {times_ms.max():.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark or batch-transcribe WAV files")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    bench_parser = commands.add_parser('bench', help="measure WER, speed and memory over a corpus")
+    bench_parser.add_argument('corpus', help="directory of .wav files with matching .txt references")
+    bench_parser.add_argument('--models', nargs='+', help="model sizes to compare (default: config)")
+    bench_parser.add_argument('--backends', nargs='+', help="backends to compare (default: config)")
+    bench_parser.add_argument('--output', help="write results as JSON to this file")
+    bench_parser.add_argument('--compare', help="previous results JSON to show deltas against")
+    bench_parser.set_defaults(func=bench)
+
+    batch_parser = commands.add_parser('transcribe', help="transcribe WAV files in parallel")
+    batch_parser.add_argument('paths', nargs='+', help=".wav files or directories")
+    batch_parser.add_argument('--jobs', type=int, help="worker processes (default: one per core)")
+    batch_parser.add_argument('--model', help="model size (default: config)")
+    batch_parser.add_argument('--backend', help="backend (default: config)")
+    batch_parser.add_argument('--write', action='store_true', help="write FILE.txt next to each FILE.wav")
+    batch_parser.set_defaults(func=transcribe)
+
+    idle_parser = commands.add_parser('idle', help="measure CPU use of the idle main loop")
+    idle_parser.add_argument('--seconds', type=float, default=10.0, help="length of the quiet period")
+    idle_parser.add_argument('--gui', action='store_true', help="show and hide the overlay first")
+    idle_parser.add_argument('--bare', action='store_true',
+                             help="only the overlay's main loop, not the service (works without a display)")
+    idle_parser.add_argument('--max-cpu', type=float, help="exit non-zero if idle CPU percent exceeds this")
+    idle_parser.set_defaults(func=idle)
+
+    render_parser = commands.add_parser('render', help="time waveform frames of the overlay (needs a display)")
+    render_parser.add_argument('--frames', type=int, default=1000, help="frames to draw")
+    render_parser.set_defaults(func=render)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
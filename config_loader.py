@@ -1,6 +1,135 @@
+import re
+import threading
 import yaml
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Set
+
+NUMBER = (int, float)
+OPTIONAL_NUMBER = (int, float, type(None))
+OPTIONAL_STR = (str, type(None))
+
+# section -> key -> accepted types, or a tuple of allowed values.
+# Keys not listed here are not checked.
+SCHEMA = {
+    'hotkey': {
+        'modifiers': list, 'key': str, 'cancel_key': OPTIONAL_STR, 'repeat_key': OPTIONAL_STR,
+        'debounce': NUMBER
+    },
+    'audio': {
+        'sample_rate': int, 'channels': int, 'timeout': NUMBER, 'silence_threshold': NUMBER,
+        'buffer_seconds': NUMBER, 'debug_wav': bool, 'preroll': dict, 'vad': dict, 'conditioning': dict
+    },
+    'whisper': {
+        'model_size': str, 'language': OPTIONAL_STR,
+        'backend': ('whisper', 'faster-whisper', 'whisper.cpp'),
+        'compute_type': str, 'beam_size': (int, type(None)), 'threads': int
+    },
+    'language': {
+        'detect': ('session', 'window', 'always'), 'min_confidence': NUMBER, 'min_logprob': NUMBER,
+        'profiles': (list, type(None))
+    },
+    'startup': {'fast_start': bool},
+    'resources': {
+        'cpu_affinity': (list, type(None)), 'idle_unload_minutes': NUMBER,
+        'auto_max_model': ('tiny', 'base', 'small', 'medium', 'large'),
+        'memory_fraction': NUMBER, 'target_rtf': NUMBER, 'state_dir': str
+    },
+    'tiering': {
+        'enabled': bool, 'draft_model': str, 'min_seconds': NUMBER,
+        'upgrade': ('replace', 'clipboard', 'notify')
+    },
+    'long_form': {
+        'enabled': bool, 'min_seconds': NUMBER, 'chunk_seconds': NUMBER, 'overlap_seconds': NUMBER,
+        'workers': int, 'threads_per_worker': int, 'pin_threads': bool
+    },
+    'vocabulary': {'enabled': bool, 'profile': str, 'prompt_tokens': int, 'profiles': (dict, type(None))},
+    'history': {
+        'enabled': bool, 'path': str, 'repeat_last': int, 'audio': bool,
+        'audio_format': ('flac', 'opus'), 'segment_mb': NUMBER, 'max_audio_mb': NUMBER
+    },
+    'api': {
+        'enabled': bool, 'socket_path': OPTIONAL_STR, 'max_queue': int, 'queue_timeout': NUMBER,
+        'max_audio_seconds': NUMBER
+    },
+    'reload': {'watch': bool, 'debounce': NUMBER},
+    'worker': {'enabled': bool, 'restart_delay': NUMBER},
+    'streaming': {
+        'enabled': bool, 'interval': NUMBER, 'min_window': NUMBER,
+        'tentative_seconds': NUMBER, 'max_window': NUMBER
+    },
+    'cache': {
+        'enabled': bool, 'memory_entries': int, 'disk': bool, 'path': str, 'max_disk_mb': NUMBER
+    },
+    'metrics': {
+        'enabled': bool, 'log_file': OPTIONAL_STR, 'prometheus_file': OPTIONAL_STR,
+        'prometheus_port': (int, type(None))
+    },
+    'output': {'type': ('type', 'clipboard', 'auto'), 'notify': bool, 'typing': dict},
+}
+
+class ConfigError(ValueError):
+    """config.yaml could not be read or does not match SCHEMA"""
+
+def _profile_errors(profile: Any) -> List[str]:
+    """Problems with one vocabulary profile; its patterns must compile"""
+    if not isinstance(profile, dict):
+        return ["must be a mapping"]
+    errors = []
+    if not isinstance(profile.get('replacements') or {}, dict):
+        errors.append("replacements must be a mapping")
+    patterns = profile.get('patterns') or []
+    if not isinstance(patterns, list):
+        return errors + ["patterns must be a list of [regex, replacement] pairs"]
+    for i, rule in enumerate(patterns):
+        if not (isinstance(rule, list) and len(rule) == 2 and all(isinstance(p, str) for p in rule)):
+            errors.append(f"patterns[{i}] must be a [regex, replacement] pair")
+            continue
+        try:
+            re.compile(rule[0])
+        except re.error as e:
+            errors.append(f"patterns[{i}] is not a valid regex: {e}")
+    return errors
+
+def validate(config: Any) -> List[str]:
+    """Return a list of problems with a parsed config.yaml, empty if it is usable"""
+    if not isinstance(config, dict):
+        return ["top level must be a mapping"]
+    errors = []
+    for name in ('hotkey', 'audio'):
+        if not isinstance(config.get(name), dict):
+            errors.append(f"missing required section '{name}'")
+    for section, keys in SCHEMA.items():
+        values = config.get(section)
+        if values is None:
+            continue
+        if not isinstance(values, dict):
+            errors.append(f"'{section}' must be a mapping")
+            continue
+        for key, expected in keys.items():
+            if key not in values:
+                continue
+            value = values[key]
+            if isinstance(expected, tuple) and all(isinstance(e, str) for e in expected):
+                if value not in expected:
+                    errors.append(f"{section}.{key} must be one of {', '.join(expected)}, not {value!r}")
+            elif not isinstance(value, expected) or (isinstance(value, bool) and expected in (int, NUMBER)):
+                errors.append(f"{section}.{key} has the wrong type ({type(value).__name__})")
+    vocabulary = config.get('vocabulary')
+    if isinstance(vocabulary, dict) and isinstance(vocabulary.get('profiles'), dict):
+        for name, profile in vocabulary['profiles'].items():
+            errors.extend(f"vocabulary.profiles.{name}: {problem}" for problem in _profile_errors(profile))
+    long_form = config.get('long_form')
+    if isinstance(long_form, dict):
+        chunk = long_form.get('chunk_seconds', 30)
+        overlap = long_form.get('overlap_seconds', 1.0)
+        if isinstance(chunk, NUMBER) and isinstance(overlap, NUMBER) and overlap >= chunk:
+            errors.append("long_form.overlap_seconds must be shorter than chunk_seconds")
+    language = config.get('language')
+    if isinstance(language, dict) and isinstance(language.get('profiles'), list):
+        for i, profile in enumerate(language['profiles']):
+            if not isinstance(profile, dict) or 'language' not in profile:
+                errors.append(f"language.profiles[{i}] must be a mapping with a 'language'")
+    return errors
 
 class Config:
     _instance = None
@@ -9,17 +138,38 @@ class Config:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Config, cls).__new__(cls)
+            cls._instance._listeners = []
+            cls._instance._reload_lock = threading.Lock()
             cls._instance._load_config()
         return cls._instance
 
+    @property
+    def path(self) -> Path:
+        return Path(__file__).parent / 'config.yaml'
+
+    def _read_config(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r') as f:
+                config = yaml.safe_load(f)
+        except (OSError, yaml.YAMLError) as e:
+            raise ConfigError(f"Could not read {self.path}: {e}")
+        errors = validate(config)
+        if errors:
+            raise ConfigError(f"Invalid {self.path.name}: " + "; ".join(errors))
+        return config
+
     def _load_config(self):
-        config_path = Path(__file__).parent / 'config.yaml'
-        with open(config_path, 'r') as f:
-            self._config = yaml.safe_load(f)
+        self._config = self._read_config()
 
     @property
     def hotkey(self) -> Dict[str, Any]:
-        return self._config['hotkey']
+        hotkey = {
+            'cancel_key': 'esc',
+            'repeat_key': None,
+            'debounce': 0.3
+        }
+        hotkey.update(self._config['hotkey'])
+        return hotkey
 
     @property
     def audio(self) -> Dict[str, Any]:
@@ -27,7 +177,27 @@ class Config:
 
     @property
     def whisper(self) -> Dict[str, Any]:
-        return self._config['whisper']
+        whisper = {
+            'model_size': 'base',
+            'language': None,
+            'backend': 'whisper',
+            'compute_type': 'int8',
+            'beam_size': None,
+            'threads': 0
+        }
+        whisper.update(self._config.get('whisper') or {})
+        return whisper
+
+    @property
+    def language(self) -> Dict[str, Any]:
+        language = {
+            'detect': 'session',
+            'min_confidence': 0.8,
+            'min_logprob': -1.0,
+            'profiles': []
+        }
+        language.update(self._config.get('language') or {})
+        return language
 
     @property
     def output(self) -> Dict[str, Any]:
@@ -41,10 +211,224 @@ class Config:
             }
         })
 
+    @property
+    def vad(self) -> Dict[str, Any]:
+        vad = {
+            'enabled': True,
+            'auto_stop': True,
+            'frame_ms': 30,
+            'hangover_ms': 300,
+            'padding_ms': 200,
+            'zcr_threshold': 0.25,
+            'min_pause': 0.8
+        }
+        vad.update(self.audio.get('vad') or {})
+        return vad
+
+    @property
+    def reload_settings(self) -> Dict[str, Any]:
+        settings = {
+            'watch': True,
+            'debounce': 0.3
+        }
+        settings.update(self._config.get('reload') or {})
+        return settings
+
+    @property
+    def startup(self) -> Dict[str, Any]:
+        startup = {
+            'fast_start': True
+        }
+        startup.update(self._config.get('startup') or {})
+        return startup
+
+    @property
+    def resources(self) -> Dict[str, Any]:
+        resources = {
+            'cpu_affinity': [],
+            'idle_unload_minutes': 0,
+            'auto_max_model': 'small',
+            'memory_fraction': 0.5,
+            'target_rtf': 0.5,
+            'state_dir': '~/.cache/voxtalkinux'
+        }
+        resources.update(self._config.get('resources') or {})
+        return resources
+
+    @property
+    def worker(self) -> Dict[str, Any]:
+        worker = {
+            'enabled': True,
+            'restart_delay': 1.0
+        }
+        worker.update(self._config.get('worker') or {})
+        return worker
+
+    @property
+    def preroll(self) -> Dict[str, Any]:
+        preroll = {
+            'enabled': False,
+            'seconds': 0.5,
+            'idle_timeout': 300
+        }
+        preroll.update(self.audio.get('preroll') or {})
+        return preroll
+
+    @property
+    def conditioning(self) -> Dict[str, Any]:
+        conditioning = {
+            'enabled': True,
+            'interval': 0.25,
+            'dc_cutoff': 20.0,
+            'normalize': True,
+            'target_peak': 0.5,
+            'max_gain': 4.0,
+            'limit': True
+        }
+        conditioning.update(self.audio.get('conditioning') or {})
+        return conditioning
+
+    @property
+    def streaming(self) -> Dict[str, Any]:
+        streaming = {
+            'enabled': False,
+            'interval': 2.0,
+            'min_window': 3.0,
+            'tentative_seconds': 2.0,
+            'max_window': 20.0
+        }
+        streaming.update(self._config.get('streaming') or {})
+        return streaming
+
+    @property
+    def tiering(self) -> Dict[str, Any]:
+        tiering = {
+            'enabled': False,
+            'draft_model': 'tiny',
+            'min_seconds': 3.0,
+            'upgrade': 'replace'
+        }
+        tiering.update(self._config.get('tiering') or {})
+        return tiering
+
+    @property
+    def long_form(self) -> Dict[str, Any]:
+        long_form = {
+            'enabled': False,
+            'min_seconds': 60.0,
+            'chunk_seconds': 30.0,
+            'overlap_seconds': 1.0,
+            'workers': 0,
+            'threads_per_worker': 0,
+            'pin_threads': True
+        }
+        long_form.update(self._config.get('long_form') or {})
+        return long_form
+
+    @property
+    def vocabulary(self) -> Dict[str, Any]:
+        vocabulary = {
+            'enabled': True,
+            'profile': 'default',
+            'prompt_tokens': 100,
+            'profiles': {}
+        }
+        vocabulary.update(self._config.get('vocabulary') or {})
+        return vocabulary
+
+    @property
+    def history(self) -> Dict[str, Any]:
+        history = {
+            'enabled': True,
+            'path': '~/.local/share/voxtalkinux/history.sqlite',
+            'repeat_last': 1,
+            'audio': False,
+            'audio_format': 'flac',
+            'segment_mb': 16,
+            'max_audio_mb': 512
+        }
+        history.update(self._config.get('history') or {})
+        return history
+
+    @property
+    def api(self) -> Dict[str, Any]:
+        api = {
+            'enabled': True,
+            'socket_path': None,
+            'max_queue': 4,
+            'queue_timeout': 30.0,
+            'max_audio_seconds': 3600
+        }
+        api.update(self._config.get('api') or {})
+        return api
+
+    @property
+    def cache(self) -> Dict[str, Any]:
+        cache = {
+            'enabled': True,
+            'memory_entries': 64,
+            'disk': False,
+            'path': '~/.cache/voxtalkinux/transcripts.sqlite',
+            'max_disk_mb': 100
+        }
+        cache.update(self._config.get('cache') or {})
+        return cache
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        metrics = {
+            'enabled': True,
+            'log_file': '~/.cache/voxtalkinux/latency.jsonl',
+            'prometheus_file': None,
+            'prometheus_port': None
+        }
+        metrics.update(self._config.get('metrics') or {})
+        return metrics
+
     @property
     def typing(self) -> Dict[str, Any]:
-        return self.output['typing']
+        typing = {
+            'delay_between_chars': 0.0,
+            'add_trailing_space': True,
+            'retry_count': 3,
+            'method': 'auto',
+            'paste_threshold': 300,
+            'paste_restore_delay': 0.15
+        }
+        typing.update(self.output.get('typing') or {})
+        return typing
+
+    def override(self, section: str, **values):
+        """Change settings of one section in memory, without touching config.yaml"""
+        self._config.setdefault(section, {}).update(values)
 
-    def reload(self):
-        """Reload configuration from file"""
-        self._load_config() 
\ No newline at end of file
+    def add_listener(self, listener: Callable[[Set[str]], None]):
+        """Call listener with the names of the changed sections after every reload"""
+        self._listeners.append(listener)
+
+    def reload(self) -> Set[str]:
+        """
+        Reload configuration from file
+
+        The current settings stay in place if the file is invalid.
+
+        Returns:
+            Names of the top-level sections that changed
+
+        Raises:
+            ConfigError: if the file can't be read or fails validation
+        """
+        with self._reload_lock:
+            config = self._read_config()
+            old, self._config = self._config, config
+            changed = {
+                section for section in set(old) | set(config)
+                if old.get(section) != config.get(section)
+            }
+        if changed:
+            for listener in list(self._listeners):
+                try:
+                    listener(changed)
+                except Exception as e:
+                    print(f"Config listener failed: {e}")
+        return changed 
\ No newline at end of file
@@ -0,0 +1,132 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from typing import Optional
+from config_loader import Config, ConfigError
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class ConfigWatcher:
+    """
+    Reload config.yaml whenever it changes on disk.
+
+    Watches the file's directory with inotify (editors often save by writing
+    a new file and renaming it over the old one) and falls back to polling
+    the modification time where inotify isn't available. Changes are
+    debounced, then applied through Config.reload, which notifies listeners
+    of the changed sections. An invalid file is reported and ignored.
+    With inotify the thread sleeps until something happens in the directory
+    or stop() writes to its wakeup pipe, so an idle service never wakes up.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fd: Optional[int] = None
+        self._wake_r: Optional[int] = None
+        self._wake_w: Optional[int] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._fd = self._inotify_watch()
+        if self._fd is not None:
+            self._wake_r, self._wake_w = os.pipe()
+        target = self._watch_inotify if self._fd is not None else self._watch_mtime
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._wake_w is not None:
+            os.write(self._wake_w, b'\0')
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._wake_r = self._wake_w = None
+
+    def _inotify_watch(self) -> Optional[int]:
+        """Set up an inotify watch on the config directory, or None if unsupported"""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return None
+            mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+            if libc.inotify_add_watch(fd, str(self.config.path.parent).encode(), mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError, TypeError):
+            return None
+
+    def _watch_inotify(self):
+        name = self.config.path.name.encode()
+        while not self._stop.is_set():
+            # No timeout: stop() wakes us through the pipe
+            ready, _, _ = select.select([self._fd, self._wake_r], [], [])
+            if self._fd not in ready:
+                continue
+            try:
+                data = os.read(self._fd, 4096)
+            except BlockingIOError:
+                continue
+            if name in self._event_names(data):
+                self._changed()
+
+    @staticmethod
+    def _event_names(data: bytes):
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            yield data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+    def _watch_mtime(self):
+        # Only without inotify: polling is the one way to notice changes
+        last = self._mtime()
+        while not self._stop.wait(1.0):
+            mtime = self._mtime()
+            if mtime != last:
+                last = mtime
+                self._changed()
+
+    def _mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.config.path).st_mtime
+        except OSError:
+            return None
+
+    def _changed(self):
+        # Let the editor finish writing, and fold a burst of events into one reload
+        time.sleep(self.config.reload_settings['debounce'])
+        if self._fd is not None:
+            try:
+                while os.read(self._fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+        try:
+            changed = self.config.reload()
+        except ConfigError as e:
+            print(f"Keeping the previous configuration: {e}")
+            return
+        if changed:
+            print(f"Configuration reloaded, changed: {', '.join(sorted(changed))}")
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Local dictation history.
+
+    python history.py last [-n 10]
+    python history.py search QUERY [-n 20]
+    python history.py copy ID
+    python history.py audio ID OUTPUT.wav
+
+Every transcript is appended to a SQLite database with an FTS5 index, so
+search stays fast however long the history gets. Audio is kept only if
+history.audio is set, compressed (FLAC or Opus, needs the soundfile
+package) and appended to segment files of history.segment_mb each; the
+oldest segments are removed once they add up to more than max_audio_mb.
+"""
+
+import argparse
+import io
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from config_loader import Config
+
+# soundfile format and subtype per history.audio_format
+AUDIO_FORMATS = {'flac': ('FLAC', 'PCM_16'), 'opus': ('OGG', 'OPUS')}
+
+
+class DictationHistory:
+    """
+    Append-only store of transcripts, with full-text search and optional audio.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self._lock = threading.Lock()
+        self._db = None
+        self.has_fts = False
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.config.history
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings['enabled']
+
+    @property
+    def path(self) -> Path:
+        return Path(os.path.expanduser(self.settings['path']))
+
+    @property
+    def audio_dir(self) -> Path:
+        return self.path.parent / 'audio'
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Guarded by self._lock, so one connection can serve every thread
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            with self._db:
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS entries ('
+                    'id INTEGER PRIMARY KEY, created REAL NOT NULL, text TEXT NOT NULL, '
+                    'window_class TEXT, model_size TEXT, audio_seconds REAL, output_ok INTEGER, '
+                    'audio_segment TEXT, audio_offset INTEGER, audio_length INTEGER)'
+                )
+                try:
+                    self._db.execute(
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts "
+                        "USING fts5(text, content='entries', content_rowid='id')"
+                    )
+                    self._db.execute(
+                        'CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN '
+                        'INSERT INTO entries_fts (rowid, text) VALUES (new.id, new.text); END'
+                    )
+                    self.has_fts = True
+                except sqlite3.OperationalError:
+                    # SQLite built without FTS5: search falls back to LIKE
+                    self.has_fts = False
+        return self._db
+
+    def record(self, text: str, audio=None, **fields) -> Optional[int]:
+        """
+        Append a transcript
+
+        Args:
+            text: The transcript as output
+            audio: 16 kHz float32 recording, kept if history.audio is set
+            fields: window_class, model_size, audio_seconds, output_ok
+
+        Returns:
+            The entry id, or None if the history is disabled or unwritable
+        """
+        if not self.enabled or not text:
+            return None
+        segment = offset = length = None
+        if audio is not None and self.settings['audio']:
+            try:
+                segment, offset, length = self._store_audio(audio)
+            except Exception as e:
+                print(f"Not keeping audio in history: {e}")
+        with self._lock:
+            try:
+                db = self._connect()
+                with db:
+                    cursor = db.execute(
+                        'INSERT INTO entries (created, text, window_class, model_size, audio_seconds, '
+                        'output_ok, audio_segment, audio_offset, audio_length) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (time.time(), text, fields.get('window_class'), fields.get('model_size'),
+                         fields.get('audio_seconds'), fields.get('output_ok'), segment, offset, length)
+                    )
+                return cursor.lastrowid
+            except (sqlite3.Error, OSError) as e:
+                print(f"History write failed: {e}")
+                return None
+
+    def last(self, count: int = 1) -> List[Dict[str, Any]]:
+        """The count most recent entries, newest first"""
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT * FROM entries ORDER BY id DESC LIMIT ?', (count,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute('SELECT * FROM entries WHERE id = ?', (entry_id,)).fetchone()
+        return dict(row) if row else None
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Entries matching query, best matches first (FTS5 syntax, plain words work too)"""
+        with self._lock:
+            db = self._connect()
+            if not self.has_fts:
+                rows = db.execute(
+                    'SELECT * FROM entries WHERE text LIKE ? ORDER BY id DESC LIMIT ?',
+                    (f'%{query}%', limit)
+                ).fetchall()
+                return [dict(row) for row in rows]
+            sql = ('SELECT entries.* FROM entries_fts JOIN entries ON entries.id = entries_fts.rowid '
+                   'WHERE entries_fts MATCH ? ORDER BY bm25(entries_fts), entries.id DESC LIMIT ?')
+            try:
+                rows = db.execute(sql, (query, limit)).fetchall()
+            except sqlite3.OperationalError:
+                # Not valid FTS5 syntax: search for the words literally
+                quoted = ' '.join('"' + word.replace('"', '""') + '"' for word in query.split())
+                rows = db.execute(sql, (quoted, limit)).fetchall() if quoted else []
+        return [dict(row) for row in rows]
+
+    def _store_audio(self, audio):
+        """Compress audio and append it to the current segment file; returns (segment, offset, length)"""
+        import soundfile
+        from audio_recorder import WHISPER_SAMPLE_RATE
+
+        container, subtype = AUDIO_FORMATS[self.settings['audio_format']]
+        data = io.BytesIO()
+        soundfile.write(data, audio, WHISPER_SAMPLE_RATE, format=container, subtype=subtype)
+        data = data.getvalue()
+
+        with self._lock:
+            self.audio_dir.mkdir(parents=True, exist_ok=True)
+            segments = sorted(self.audio_dir.glob('*.seg'))
+            limit = self.settings['segment_mb'] * 1024 * 1024
+            if not segments or segments[-1].stat().st_size + len(data) > limit:
+                number = int(segments[-1].stem) + 1 if segments else 1
+                segments.append(self.audio_dir / f'{number:08d}.seg')
+            segment = segments[-1]
+            with open(segment, 'ab') as f:
+                offset = f.tell()
+                f.write(data)
+            self._evict_audio(segments)
+        return segment.name, offset, len(data)
+
+    def _evict_audio(self, segments: List[Path]):
+        """Delete the oldest segment files until the rest fit in max_audio_mb"""
+        budget = self.settings['max_audio_mb'] * 1024 * 1024
+        sizes = [s.stat().st_size if s.exists() else 0 for s in segments]
+        # The segment being written to always stays
+        while len(segments) > 1 and sum(sizes) > budget:
+            segments.pop(0).unlink(missing_ok=True)
+            sizes.pop(0)
+
+    def audio(self, entry_id: int):
+        """The recording of an entry as 16 kHz float32, or None if it wasn't kept or has been evicted"""
+        import soundfile
+
+        entry = self.get(entry_id)
+        if entry is None or entry['audio_segment'] is None:
+            return None
+        try:
+            with open(self.audio_dir / entry['audio_segment'], 'rb') as f:
+                f.seek(entry['audio_offset'])
+                data = f.read(entry['audio_length'])
+        except FileNotFoundError:
+            return None
+        audio, _ = soundfile.read(io.BytesIO(data), dtype='float32')
+        return audio
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def _print_entries(entries: List[Dict[str, Any]]):
+    for entry in entries:
+        created = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['created']))
+        audio = ' [audio]' if entry['audio_segment'] else ''
+        print(f"{entry['id']:>6}  {created}{audio}  {entry['text']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search and reuse past dictations")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    last_parser = commands.add_parser('last', help="show the most recent dictations")
+    last_parser.add_argument('-n', type=int, default=10, help="how many (default: 10)")
+
+    search_parser = commands.add_parser('search', help="full-text search")
+    search_parser.add_argument('query', nargs='+', help="words or an FTS5 query")
+    search_parser.add_argument('-n', type=int, default=20, help="maximum results (default: 20)")
+
+    copy_parser = commands.add_parser('copy', help="copy a dictation to the clipboard")
+    copy_parser.add_argument('id', type=int)
+
+    audio_parser = commands.add_parser('audio', help="write the recording of a dictation to a WAV file")
+    audio_parser.add_argument('id', type=int)
+    audio_parser.add_argument('output', help="destination .wav file")
+
+    args = parser.parse_args()
+    history = DictationHistory()
+    if not history.path.exists():
+        sys.exit(f"No history yet at {history.path}")
+
+    if args.command == 'last':
+        _print_entries(history.last(args.n))
+    elif args.command == 'search':
+        _print_entries(history.search(' '.join(args.query), args.n))
+    elif args.command == 'copy':
+        entry = history.get(args.id)
+        if entry is None:
+            sys.exit(f"No dictation {args.id}")
+        import pyperclip
+        pyperclip.copy(entry['text'])
+    elif args.command == 'audio':
+        audio = history.audio(args.id)
+        if audio is None:
+            sys.exit(f"No audio kept for dictation {args.id}")
+        import soundfile
+        from audio_recorder import WHISPER_SAMPLE_RATE
+        soundfile.write(args.output, audio, WHISPER_SAMPLE_RATE, subtype='PCM_16')
+
+
+if __name__ == "__main__":
+    main()
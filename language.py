@@ -0,0 +1,130 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from config_loader import Config
+
+
+class LanguageChoice:
+    """The language one recording is decoded in, and where it came from"""
+
+    def __init__(self, language: Optional[str], source: str, key: Optional[str] = None):
+        self.language = language
+        # 'profile', 'config', 'detected' (reused detection) or 'detect' (detect now)
+        self.source = source
+        self.key = key
+
+
+class LanguageSelector:
+    """
+    Picks the decoding language when whisper.language is null.
+
+    Instead of detecting on every decode, the language detected for a
+    recording is reused for the rest of the session (or, with
+    language.detect: window, for the rest of the session in that window
+    class) as long as detection was at least language.min_confidence sure.
+    A reused language is dropped again when a decode in it comes back with
+    an average log-probability below language.min_logprob, which is what
+    speaking a different language looks like; the next recording detects
+    afresh. A language profile selected by hotkey overrides all of this.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self._lock = threading.Lock()
+        # Session key (window class or None) -> (language, probability)
+        self._detected: Dict[Optional[str], Tuple[str, Optional[float]]] = {}
+        self.profile: Optional[Dict[str, Any]] = None
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.config.language
+
+    @property
+    def profiles(self) -> List[Dict[str, Any]]:
+        return self.settings['profiles'] or []
+
+    def select(self, index: int) -> str:
+        """
+        Pin the profile at index, or unpin it if it is already selected
+
+        Returns:
+            Message describing the language now in effect
+        """
+        profile = self.profiles[index]
+        with self._lock:
+            if self.profile == profile or profile.get('language') is None:
+                self.profile = None
+            else:
+                self.profile = profile
+        if self.profile is None:
+            return "Language: " + (self.config.whisper['language'] or "auto-detect")
+        return f"Language: {self.profile.get('name') or self.profile['language']}"
+
+    def _key(self) -> Optional[str]:
+        if self.settings['detect'] != 'window':
+            return None
+        from text_injection import active_window_class
+        try:
+            return active_window_class()
+        except Exception:
+            return None
+
+    def choose(self) -> LanguageChoice:
+        """Language for the next recording; call once per recording"""
+        profile = self.profile
+        if profile is not None:
+            return LanguageChoice(profile['language'], 'profile')
+        configured = self.config.whisper['language']
+        if configured:
+            return LanguageChoice(configured, 'config')
+        if self.settings['detect'] == 'always':
+            return LanguageChoice(None, 'detect')
+        key = self._key()
+        with self._lock:
+            detected = self._detected.get(key)
+        if detected is not None:
+            return LanguageChoice(detected[0], 'detected', key)
+        return LanguageChoice(None, 'detect', key)
+
+    def update(self, choice: LanguageChoice, result: Dict[str, Any]) -> LanguageChoice:
+        """
+        Learn from a decode made with choice
+
+        Args:
+            choice: What the decode was given
+            result: Its Whisper result, with "language" and, where the
+                backend reports it, "language_probability"
+
+        Returns:
+            The choice for the next piece of the same recording
+        """
+        settings = self.settings
+        if choice.source == 'detect' and settings['detect'] != 'always':
+            language = result.get('language')
+            probability = result.get('language_probability')
+            if not language or not result.get('text', '').strip():
+                return choice  # Nothing was said, so nothing was learned
+            if probability is not None and probability < settings['min_confidence']:
+                print(f"Detected language {language} at {probability:.2f}, below "
+                      f"min_confidence; detecting again next time")
+                return choice
+            with self._lock:
+                self._detected[choice.key] = (language, probability)
+            print(f"Detected language {language}" +
+                  (f" ({probability:.2f})" if probability is not None else "") +
+                  (f" for {choice.key}" if choice.key else "") + ", reusing it")
+            return LanguageChoice(language, 'detected', choice.key)
+
+        if choice.source == 'detected':
+            logprobs = [s['avg_logprob'] for s in result.get('segments') or () if 'avg_logprob' in s]
+            if logprobs and sum(logprobs) / len(logprobs) < settings['min_logprob']:
+                with self._lock:
+                    if self._detected.get(choice.key, (None,))[0] == choice.language:
+                        del self._detected[choice.key]
+                print(f"Decoding in {choice.language} looks unsure, detecting the language again")
+                return LanguageChoice(None, 'detect', choice.key)
+        return choice
+
+    def forget(self):
+        """Drop every reused detection, e.g. after the model changed"""
+        with self._lock:
+            self._detected.clear()
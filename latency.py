@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from config_loader import Config
+
+
+def _append(entry: Dict[str, Any]):
+    """Append one JSON line to metrics.log_file"""
+    path = Config().metrics['log_file']
+    if not path:
+        return
+    try:
+        path = Path(os.path.expanduser(path))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # One write per line keeps concurrent writers (e.g. the worker process) from interleaving
+        with open(path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+    except OSError as e:
+        print(f"Could not write latency log: {e}")
+
+
+def log_event(event: str, duration: float, **fields):
+    """
+    Log something that happens outside any single utterance, such as a model load
+
+    Safe to call from any process; it only appends to the JSONL log.
+    """
+    if Config().metrics['enabled']:
+        _append({'event': event, 'time': time.time(), 'duration': round(duration, 6), **fields})
+
+
+class Trace:
+    """
+    Timing spans for one utterance, from capture start to text output.
+
+    Spans use time.monotonic() so they can be compared across threads; they
+    are written relative to the moment the trace was created.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.created = time.time()
+        self.origin = time.monotonic()
+        self.spans: List[Dict[str, Any]] = []
+        self.fields: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, end: float, **fields):
+        """Record a span from two time.monotonic() readings"""
+        if name == 'decode' and fields.get('audio_seconds'):
+            fields['real_time_factor'] = round((end - start) / fields['audio_seconds'], 4)
+        with self._lock:
+            self.spans.append(dict(
+                name=name,
+                start=round(start - self.origin, 6),
+                duration=round(end - start, 6),
+                **fields
+            ))
+
+    @contextmanager
+    def span(self, name: str, **fields):
+        """
+        Time the body of a with-block
+
+        Yields the span's field dict, so the body can attach results to it.
+        """
+        start = time.monotonic()
+        try:
+            yield fields
+        finally:
+            self.add(name, start, time.monotonic(), **fields)
+
+    def duration(self, name: str) -> float:
+        """Total seconds spent in spans with the given name"""
+        with self._lock:
+            return sum(s['duration'] for s in self.spans if s['name'] == name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'id': self.id,
+                'time': self.created,
+                **self.fields,
+                'spans': list(self.spans)
+            }
+
+
+class LatencyLog:
+    """
+    Collects finished traces into a JSONL log and Prometheus-style metrics.
+
+    Each utterance becomes one JSON line in metrics.log_file. Running totals
+    are exposed in the Prometheus text format, written to
+    metrics.prometheus_file and/or served on 127.0.0.1:metrics.prometheus_port.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self._lock = threading.Lock()
+        self._utterances = 0
+        self._span_totals: Dict[str, List[float]] = {}  # name -> [seconds, count]
+        self._audio_seconds = 0.0
+        self._decode_seconds = 0.0
+        self._last_rtf: Optional[float] = None
+        self._server = None
+
+        port = self.settings['prometheus_port']
+        if self.settings['enabled'] and port:
+            self._start_server(port)
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.config.metrics
+
+    def new_trace(self) -> Trace:
+        return Trace()
+
+    def record(self, trace: Trace):
+        """Log a finished utterance and fold it into the running totals"""
+        if not self.settings['enabled']:
+            return
+
+        with self._lock:
+            self._utterances += 1
+            for span in trace.spans:
+                total = self._span_totals.setdefault(span['name'], [0.0, 0])
+                total[0] += span['duration']
+                total[1] += 1
+                if span['name'] == 'decode' and span.get('audio_seconds'):
+                    self._audio_seconds += span['audio_seconds']
+                    self._decode_seconds += span['duration']
+                    self._last_rtf = span['duration'] / span['audio_seconds']
+
+        _append(trace.to_dict())
+        self._write_prometheus_file()
+
+    def prometheus_text(self) -> str:
+        """Current totals in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                '# TYPE voxtalkinux_utterances_total counter',
+                f'voxtalkinux_utterances_total {self._utterances}',
+                '# TYPE voxtalkinux_span_seconds summary',
+            ]
+            for name, (seconds, count) in sorted(self._span_totals.items()):
+                lines.append(f'voxtalkinux_span_seconds_sum{{span="{name}"}} {seconds:.6f}')
+                lines.append(f'voxtalkinux_span_seconds_count{{span="{name}"}} {count}')
+            lines += [
+                '# TYPE voxtalkinux_audio_seconds_total counter',
+                f'voxtalkinux_audio_seconds_total {self._audio_seconds:.6f}',
+                '# TYPE voxtalkinux_decode_seconds_total counter',
+                f'voxtalkinux_decode_seconds_total {self._decode_seconds:.6f}',
+            ]
+            if self._last_rtf is not None:
+                lines += [
+                    '# TYPE voxtalkinux_real_time_factor gauge',
+                    f'voxtalkinux_real_time_factor {self._last_rtf:.6f}',
+                ]
+        return '\n'.join(lines) + '\n'
+
+    def _write_prometheus_file(self):
+        path = self.settings['prometheus_file']
+        if not path:
+            return
+        path = Path(os.path.expanduser(path))
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so scrapers never see a half-written file
+            tmp = path.with_suffix(path.suffix + '.tmp')
+            tmp.write_text(self.prometheus_text())
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Could not write metrics file: {e}")
+
+    def _start_server(self, port: int):
+        log = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = log.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the service log
+
+        try:
+            self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        except OSError as e:
+            print(f"Could not start metrics endpoint on port {port}: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
@@ -1,15 +1,19 @@
-import pyperclip
-import pyautogui
 import subprocess
+import time
+from contextlib import nullcontext
 from config_loader import Config
 from typing import Optional
+from text_injection import TextInjector, InjectionError, active_window_class
+
+# Key presses seen this soon after our own typing are taken to be its echo
+ECHO_SECONDS = 0.25
 
 class OutputHandler:
     def __init__(self):
         self.config = Config()
-        # Ensure PyAutoGUI fails safe
-        pyautogui.FAILSAFE = True
-        pyautogui.PAUSE = 0
+        self.injector = TextInjector()
+        # (text as typed, window class) of the last successful typing, for replace_last
+        self.last_typed = None
 
     def _show_notification(self, message: str):
         """Show a desktop notification"""
@@ -24,48 +28,70 @@ class OutputHandler:
             # Fail silently if notifications aren't available
             pass
 
+    def note_key_press(self):
+        """Called by the keyboard listener for every key press; never blocks"""
+        # The listener also sees the keys we inject ourselves
+        if self._typing or time.monotonic() - self._typing_ended < ECHO_SECONDS:
+            return
+        self.keys_since_typed += 1
+
     def _try_typing(self, text: str) -> bool:
         """Attempt to type the text"""
         if not text:
             return False
+        self._typing = True
+        try:
+            return self._type(text)
+        finally:
+            self._typing_ended = time.monotonic()
+            self._typing = False
 
-        config = self.config.output['typing']
-        delay = config['delay_between_chars']
-        add_space = config['add_trailing_space']
+    def _type(self, text: str) -> bool:
+        config = self.config.typing
         retry_count = config['retry_count']
 
+        # Add trailing space if configured
+        if config['add_trailing_space']:
+            text += ' '
+
+        window_class = active_window_class()
+        self.last_typed = None
+        typed = 0
         for attempt in range(retry_count):
             try:
-                # Type the text character by character
-                for char in text:
-                    pyautogui.write(char, interval=delay)
-
-                # Add trailing space if configured
-                if add_space:
-                    pyautogui.write(' ', interval=delay)
+                # Retries pick up at the first character that didn't make it
+                typed += self.injector.inject(text[typed:], window_class)
+                self.last_typed = (text, window_class)
+                self.keys_since_typed = 0
                 return True
-            except Exception as e:
-                print(f"Typing attempt {attempt + 1} failed: {e}")
-                if attempt == retry_count - 1:
-                    return False
+            except InjectionError as e:
+                typed += e.typed
+                print(f"Typing attempt {attempt + 1} failed after {typed}/{len(text)} chars: {e}")
+        return False
 
     def _copy_to_clipboard(self, text: str) -> bool:
         """Copy the text to clipboard"""
         try:
+            import pyperclip
             pyperclip.copy(text)
             return True
         except Exception as e:
             print(f"Failed to copy to clipboard: {e}")
             return False
 
-    def output_text(self, text: str) -> bool:
+    def output_text(self, text: str, trace=None) -> bool:
         """
         Output the text according to configuration
         Returns True if successful, False otherwise
+
+        If a latency.Trace is given, typing and clipboard attempts are timed on it
         """
         if not text:
             return False
 
+        def span(name):
+            return trace.span(name, chars=len(text)) if trace else nullcontext({})
+
         output_type = self.config.output['type']
         notify = self.config.output['notify']
 
@@ -73,20 +99,70 @@ class OutputHandler:
         message = ""
 
         if output_type in ['type', 'auto']:
-            success = self._try_typing(text)
+            with span('output_typing'):
+                success = self._try_typing(text)
             if success:
                 # Skip notification for successful typing
                 return True
             elif output_type == 'auto':
                 # Fall back to clipboard
-                success = self._copy_to_clipboard(text)
+                with span('output_clipboard'):
+                    success = self._copy_to_clipboard(text)
                 message = "Text copied to clipboard (typing failed)"
         
         if output_type == 'clipboard' or (output_type == 'auto' and not success):
-            success = self._copy_to_clipboard(text)
+            with span('output_clipboard'):
+                success = self._copy_to_clipboard(text)
             message = "Text copied to clipboard"
 
         if notify and message:
             self._show_notification(message)
 
-        return success 
\ No newline at end of file
+        return success
+
+    def replace_last(self, text: str) -> bool:
+        """
+        Replace the most recently typed text with a new version
+
+        Only done while the window it was typed into still has focus and
+        no key has been pressed since, so the user's own edits and the
+        cursor position are never erased over.
+        Returns True if the text was replaced.
+        """
+        if self.last_typed is None:
+            return False
+        previous, window_class = self.last_typed
+        if self.keys_since_typed:
+            print(f"{self.keys_since_typed} keys pressed since the draft was typed, not replacing it")
+            return False
+        if active_window_class() != window_class:
+            return False
+        self._typing = True
+        try:
+            self.injector.erase(len(previous))
+        except Exception as e:
+            print(f"Could not erase the previous text: {e}")
+            return False
+        finally:
+            self._typing_ended = time.monotonic()
+            self._typing = False
+        return self._try_typing(text)
+
+    def publish_correction(self, draft: str, text: str) -> bool:
+        """
+        Deliver a better transcript after the draft was already output
+
+        How depends on tiering.upgrade: 'replace' retypes it over the draft
+        (falling back to the clipboard when that isn't safe), 'clipboard'
+        copies it, and 'notify' only shows it.
+        """
+        mode = self.config.tiering['upgrade']
+        if mode == 'replace' and self.config.output['type'] != 'clipboard' and self.replace_last(text):
+            return True
+        if mode == 'notify':
+            self._show_notification(f"Corrected: {text}")
+            return True
+        success = self._copy_to_clipboard(text)
+        if success and self.config.output['notify']:
+            self._show_notification("Corrected transcript copied to clipboard")
+        return success
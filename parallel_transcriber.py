@@ -0,0 +1,277 @@
+import multiprocessing as mp
+import os
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from config_loader import Config
+from audio_recorder import VoiceActivityDetector, WHISPER_SAMPLE_RATE
+from resources import ResourceGovernor
+
+# Only used in the pool processes
+_transcriber = None
+
+
+def _init_worker(counter, loaded, threads: int, pin: bool):
+    """Give each pool process its own model and, optionally, its own cores"""
+    global _transcriber
+    from transcriber import Transcriber
+
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    if pin and hasattr(os, 'sched_setaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+        mine = cores[(index * threads) % len(cores):][:threads]
+        if mine:
+            os.sched_setaffinity(0, mine)
+
+    Config().override('whisper', threads=threads)
+    _transcriber = Transcriber()
+    with loaded.get_lock():
+        loaded.value += 1
+
+
+def _ping():
+    """Does nothing; submitted once per worker so the pool starts all of them"""
+
+
+def _decode_chunk(audio: np.ndarray, language: Optional[str] = None) -> List[Dict[str, Any]]:
+    result = _transcriber.transcribe_segments(audio, language=language)
+    # Only what stitching needs crosses the process boundary
+    return [
+        {"start": s["start"], "end": s["end"], "text": s["text"]}
+        for s in result["segments"] if s["text"].strip()
+    ]
+
+
+def plan_chunks(audio: np.ndarray, vad: Optional[VoiceActivityDetector],
+                chunk_seconds: float, overlap_seconds: float) -> List[Tuple[int, int]]:
+    """
+    Cut a recording into chunks of at most chunk_seconds
+
+    Chunks end in pauses found by the VAD where possible. Speech that runs
+    longer than a chunk without a pause is cut at fixed points instead, and
+    those chunks overlap by overlap_seconds so no word is lost at the cut.
+
+    Returns:
+        (start, end) sample ranges, in order
+    """
+    chunk = int(chunk_seconds * WHISPER_SAMPLE_RATE)
+    overlap = int(overlap_seconds * WHISPER_SAMPLE_RATE)
+    if overlap >= chunk:
+        # The fixed cuts would never move forward
+        raise ValueError("overlap_seconds must be shorter than chunk_seconds")
+    ranges = vad.split(audio) if vad is not None else [(0, audio.size)]
+
+    chunks = []
+    current = None
+    for start, end in ranges:
+        if current is not None and end - current[0] <= chunk:
+            current = (current[0], end)
+            continue
+        if current is not None:
+            chunks.append(current)
+        while end - start > chunk:
+            chunks.append((start, start + chunk))
+            start += chunk - overlap
+        current = (start, end)
+    if current is not None:
+        chunks.append(current)
+    return chunks
+
+
+def stitch(chunks: List[Tuple[int, int]], results: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Join per-chunk segments into one Whisper-style result with absolute timestamps
+
+    Where two chunks overlap, each keeps the segments whose midpoint falls on
+    its side of the middle of the overlap. Words repeated right at a join are
+    dropped once more in case a segment straddled the cut.
+    """
+    segments = []
+    for i, ((start, end), chunk_segments) in enumerate(zip(chunks, results)):
+        offset = start / WHISPER_SAMPLE_RATE
+        lower = upper = None
+        if i > 0 and chunks[i - 1][1] > start:
+            lower = (start + chunks[i - 1][1]) / 2 / WHISPER_SAMPLE_RATE
+        if i + 1 < len(chunks) and chunks[i + 1][0] < end:
+            upper = (chunks[i + 1][0] + end) / 2 / WHISPER_SAMPLE_RATE
+
+        for segment in chunk_segments:
+            absolute = dict(segment, start=segment["start"] + offset, end=segment["end"] + offset)
+            middle = (absolute["start"] + absolute["end"]) / 2
+            if (lower is not None and middle < lower) or (upper is not None and middle >= upper):
+                continue
+            if lower is not None and segments:
+                absolute["text"] = _drop_repeated_words(segments[-1]["text"], absolute["text"])
+                lower = None  # Only the first kept segment can repeat the previous chunk
+            if absolute["text"].strip():
+                segments.append(absolute)
+
+    return {"text": " ".join(s["text"].strip() for s in segments), "segments": segments}
+
+
+def _drop_repeated_words(previous: str, text: str, max_words: int = 8) -> str:
+    """Remove the longest run of words at the start of text that ends previous"""
+    before = previous.split()
+    words = text.split()
+    normalized = lambda ws: [w.strip('.,!?;:').lower() for w in ws]
+    for n in range(min(max_words, len(before), len(words)), 0, -1):
+        if normalized(before[-n:]) == normalized(words[:n]):
+            return " ".join(words[n:])
+    return text
+
+
+class ParallelTranscriber:
+    """
+    Decode long recordings in chunks across a pool of processes.
+
+    Each worker loads its own model with long_form.threads_per_worker decode
+    threads and can be pinned to its own cores, so wall-clock time scales
+    with the number of cores instead of being bound to one decoder. The pool
+    starts loading on the first long recording, which is left to the regular
+    (already warm) transcriber; once every worker has its model, long
+    recordings go to the pool. No more workers are started than models fit
+    in the resources memory budget, and the pool shuts down again after
+    resources.idle_unload_minutes without a long recording.
+    """
+
+    def __init__(self, vad: Optional[VoiceActivityDetector] = None):
+        self.config = Config()
+        self.vad = vad
+        self.governor = ResourceGovernor()
+        self._pool = None
+        self._workers = 0
+        self._loaded = None  # Shared count of pool workers with a model loaded
+        self._lock = threading.Lock()
+        self._active = 0  # Decodes running on the pool; it isn't closed under them
+        self._idle_timer = None
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.config.long_form
+
+    def _layout(self) -> Tuple[int, int]:
+        """(workers, threads per worker), filling in automatic values; workers may be 0"""
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+        threads = self.settings['threads_per_worker'] or min(4, cores)
+        workers = self.settings['workers'] or max(1, cores // threads)
+        whisper = self.config.whisper
+        model_size = whisper['model_size']
+        if model_size == 'auto':
+            model_size, _ = self.governor.choose_model(whisper['backend'])
+        affordable = self.governor.affordable_models(model_size)
+        if affordable is not None and affordable < workers:
+            print(f"Memory budget fits {affordable} long-form workers with {model_size}, not {workers}")
+            workers = affordable
+        return workers, threads
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            workers, threads = self._layout()
+            context = mp.get_context('spawn')
+            self._workers = workers
+            self._loaded = context.Value('i', 0)
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(context.Value('i', 0), self._loaded, threads, self.settings['pin_threads'])
+            )
+        return self._pool
+
+    @property
+    def ready(self) -> bool:
+        """Whether the pool is running and every worker has loaded its model"""
+        return self._pool is not None and self._loaded.value >= self._workers
+
+    def warm_up(self):
+        """Start the pool and let its workers load their models, without waiting for them"""
+        with self._lock:
+            if self._pool is not None:
+                return
+            if self._layout()[0] < 1:
+                return  # Decoded by the caller's transcriber instead
+            pool = self._get_pool()
+            # Processes are spawned as work arrives, so give each one something to do
+            for _ in range(self._workers):
+                pool.submit(_ping)
+            self._schedule_close()
+
+    def _schedule_close(self):
+        """(Re)start the countdown to closing an unused pool; call with the lock held"""
+        minutes = self.config.resources['idle_unload_minutes']
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        if minutes:
+            self._idle_timer = threading.Timer(minutes * 60, self._close_idle)
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    def _close_idle(self):
+        with self._lock:
+            if self._pool is None or self._active:
+                return  # The running decode schedules the next check
+        print("Closing idle long-form pool")
+        self.close()
+
+    def wants(self, audio: np.ndarray) -> bool:
+        """
+        Whether audio should be decoded in parallel chunks
+
+        Long enough audio starts warming the pool, but is only wanted once
+        the pool is ready; until then the caller's own transcriber is faster
+        than waiting for every worker to load a model.
+        """
+        settings = self.settings
+        if not settings['enabled'] or audio.size < settings['min_seconds'] * WHISPER_SAMPLE_RATE:
+            return False
+        if not self.ready:
+            self.warm_up()
+            return False
+        return True
+
+    def transcribe_segments(self, audio: np.ndarray, language: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Transcribe a long 16 kHz float32 recording
+
+        Args:
+            audio: The recording
+            language: Decode every chunk in this language; detected per chunk if None
+
+        Returns:
+            Whisper-style result with "text" and "segments" (absolute timestamps)
+        """
+        settings = self.settings
+        vad = self.vad if self.config.vad['enabled'] else None
+        chunks = plan_chunks(audio, vad, settings['chunk_seconds'], settings['overlap_seconds'])
+        if not chunks:
+            return {"text": "", "segments": []}
+
+        with self._lock:
+            pool = self._get_pool()
+            self._active += 1
+        try:
+            futures = [pool.submit(_decode_chunk, audio[start:end], language) for start, end in chunks]
+            return stitch(chunks, [future.result() for future in futures])
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._schedule_close()
+
+    def transcribe_array(self, audio: np.ndarray, language: Optional[str] = None) -> str:
+        return self.transcribe_segments(audio, language)["text"]
+
+    def close(self):
+        with self._lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            pool, self._pool = self._pool, None
+            self._workers = 0
+            self._loaded = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
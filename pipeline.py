@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, Optional
+
+
+class State(Enum):
+    IDLE = 'idle'
+    RECORDING = 'recording'
+    TRANSCRIBING = 'transcribing'
+    OUTPUTTING = 'outputting'
+
+
+class Job:
+    """One unit of work for the processing thread, usually a finished recording"""
+
+    def __init__(self, payload: Any, kind: str = 'recording'):
+        self.payload = payload
+        self.kind = kind
+        # Anything but a recording only has output left to do
+        self.stage = State.TRANSCRIBING if kind == 'recording' else State.OUTPUTTING
+        self.cancelled = threading.Event()
+
+
+class Pipeline:
+    """
+    State machine for recording -> transcribing -> outputting.
+
+    Hotkey callbacks only post events, which a dispatcher thread handles in
+    order, so the keyboard listener never waits on audio, decoding or typing.
+    Finished recordings become jobs served one at a time by a processing
+    thread: a new recording can start while the previous one is still being
+    decoded, and results are still typed in the order they were spoken.
+
+    Events:
+      toggle   start recording, or stop it and queue the recording
+      cancel   discard the recording in progress, or else drop the job
+               being transcribed or output
+      timeout  stop the recording if one is in progress (silence timeout)
+    """
+
+    def __init__(self, start: Callable[[], None], stop: Callable[[], Any],
+                 discard: Callable[[], None], process: Callable[[Job], None],
+                 debounce: float = 0.3):
+        self._start = start
+        self._stop = stop
+        self._discard = discard
+        self._process = process
+        self.debounce = debounce
+        self.recording = False
+        self.current: Optional[Job] = None
+        self._last_toggle = 0.0
+        self._events: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._jobs: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._dispatch, daemon=True),
+            threading.Thread(target=self._work, daemon=True)
+        ]
+
+    @property
+    def state(self) -> State:
+        if self.recording:
+            return State.RECORDING
+        job = self.current
+        return job.stage if job is not None else State.IDLE
+
+    @property
+    def pending(self) -> int:
+        """Finished recordings waiting behind the current job"""
+        return self._jobs.qsize()
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._events.put(None)
+        self._jobs.put(None)
+
+    def post(self, event: str):
+        """Queue an event; safe to call from any thread, never blocks"""
+        if event == 'toggle':
+            # Auto-repeat and bouncy switches deliver several presses at once
+            now = time.monotonic()
+            if now - self._last_toggle < self.debounce:
+                return
+            self._last_toggle = now
+        self._events.put(event)
+
+    def submit(self, payload: Any, kind: str):
+        """Queue work other than a recording behind the current jobs, keeping output in order"""
+        self._jobs.put(Job(payload, kind))
+
+    def advance(self, job: Job, stage: State):
+        """Called by the process callback as a job moves on to its next stage"""
+        job.stage = stage
+
+    def _dispatch(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            try:
+                if event == 'toggle':
+                    if self.recording:
+                        self._finish_recording()
+                    else:
+                        self._start()
+                        self.recording = True
+                elif event == 'timeout':
+                    if self.recording:
+                        self._finish_recording()
+                elif event == 'cancel':
+                    if self.recording:
+                        self.recording = False
+                        self._discard()
+                        print("Recording cancelled")
+                    elif self.current is not None:
+                        self.current.cancelled.set()
+                        print("Transcription cancelled")
+            except Exception as e:
+                print(f"Error handling {event}: {e}")
+
+    def _finish_recording(self):
+        self.recording = False
+        payload = self._stop()
+        if payload is not None:
+            self._jobs.put(Job(payload))
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            self.current = job
+            try:
+                self._process(job)
+            except Exception as e:
+                print(f"Processing failed: {e}")
+            finally:
+                self.current = None
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+CPU and memory budgets for decoding.
+
+    python resources.py    # print budgets and what the running transcribers use
+
+Every process with a Transcriber reports its model, threads and load state
+to a small status file, so this works against the running service without
+talking to it.
+"""
+
+import fcntl
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from config_loader import Config
+
+# Smallest to largest; 'auto' picks from these
+MODEL_LADDER = ('tiny', 'base', 'small', 'medium', 'large')
+# Approximate resident size of each model while decoding on CPU, in MB
+MODEL_MEMORY_MB = {'tiny': 400, 'base': 550, 'small': 1100, 'medium': 2900, 'large': 5600}
+# Weight of a new measurement in the running real-time factor
+RTF_SMOOTHING = 0.2
+
+
+def available_memory_mb() -> Optional[float]:
+    """MemAvailable from /proc/meminfo, or None where that doesn't exist"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def allowed_cores() -> List[int]:
+    """Cores this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class ResourceGovernor:
+    """
+    Decides how many threads, which cores and which model a decode may use.
+
+    resources.cpu_affinity pins decoding processes to a set of cores, and
+    whisper.threads: 0 means half of those cores rather than all of them.
+    whisper.model_size: 'auto' picks the largest model up to
+    resources.auto_max_model that fits in available RAM, stepping down while
+    its measured real-time factor is above resources.target_rtf.
+    """
+
+    def __init__(self):
+        self.config = Config()
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.config.resources
+
+    @property
+    def state_dir(self) -> Path:
+        return Path(os.path.expanduser(self.settings['state_dir']))
+
+    def cores(self) -> List[int]:
+        allowed = allowed_cores()
+        wanted = [core for core in self.settings['cpu_affinity'] or () if core in allowed]
+        return wanted or allowed
+
+    def threads(self) -> int:
+        """Decode threads: whisper.threads if set, else half the usable cores"""
+        return self.config.whisper['threads'] or max(1, len(self.cores()) // 2)
+
+    def pin(self):
+        """Restrict the calling process to resources.cpu_affinity, if set"""
+        if self.settings['cpu_affinity'] and hasattr(os, 'sched_setaffinity'):
+            try:
+                os.sched_setaffinity(0, self.cores())
+            except OSError as e:
+                print(f"Could not set CPU affinity: {e}")
+
+    def choose_model(self, backend: str, resident: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Model size for whisper.model_size: 'auto'
+
+        Args:
+            backend: whisper.backend the model is for
+            resident: Model this process already has loaded; its memory counts
+                as available, so re-resolving doesn't step down from it
+
+        Returns:
+            (model size, reason for the choice)
+        """
+        settings = self.settings
+        ladder = MODEL_LADDER[:MODEL_LADDER.index(settings['auto_max_model']) + 1]
+        available = available_memory_mb()
+        if available is not None:
+            available += MODEL_MEMORY_MB.get(resident, 0)
+            budget = available * settings['memory_fraction']
+            fitting = [m for m in ladder if MODEL_MEMORY_MB[m] <= budget]
+            ladder = fitting or ladder[:1]
+            reason = f"fits {budget:.0f} MB budget"
+        else:
+            reason = "available memory unknown"
+        for model in reversed(ladder):
+            rtf = self.measured_rtf(model, backend)
+            if rtf is None or rtf <= settings['target_rtf'] or model == ladder[0]:
+                if rtf is not None:
+                    reason += f", measured RTF {rtf:.2f}"
+                return model, reason
+            reason += f", {model} too slow (RTF {rtf:.2f})"
+        return ladder[0], reason
+
+    def affordable_models(self, model_size: str) -> Optional[int]:
+        """
+        How many more copies of model_size fit in the memory budget
+
+        Returns:
+            The count, or None if available memory or the model's size is unknown
+        """
+        available = available_memory_mb()
+        # 'base.en' and 'large-v3' take as much memory as 'base' and 'large'
+        per_model = MODEL_MEMORY_MB.get(model_size.split('.')[0].split('-')[0])
+        if available is None or per_model is None:
+            return None
+        return int(available * self.settings['memory_fraction'] // per_model)
+
+    def _rtf_path(self) -> Path:
+        return self.state_dir / 'rtf.json'
+
+    def _read_rtf(self) -> Dict[str, Dict[str, float]]:
+        try:
+            return json.loads(self._rtf_path().read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def measured_rtf(self, model_size: str, backend: str) -> Optional[float]:
+        entry = self._read_rtf().get(f'{backend}/{model_size}')
+        return entry['rtf'] if entry else None
+
+    def record_rtf(self, model_size: str, backend: str, rtf: float):
+        """Fold one decode's real-time factor into the running average for that model"""
+        try:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            # Several processes decode; serialize their read-modify-write
+            with open(self.state_dir / 'rtf.lock', 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                data = self._read_rtf()
+                key = f'{backend}/{model_size}'
+                entry = data.get(key)
+                if entry is None:
+                    entry = {'rtf': rtf, 'count': 0}
+                else:
+                    entry['rtf'] += RTF_SMOOTHING * (rtf - entry['rtf'])
+                entry['count'] += 1
+                data[key] = entry
+                self._rtf_path().write_text(json.dumps(data))
+        except OSError as e:
+            print(f"Could not record real-time factor: {e}")
+
+    def report(self, **status):
+        """Publish this process's model and thread use for the status command"""
+        path = self.state_dir / 'status' / f'{os.getpid()}.json'
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({'pid': os.getpid(), 'updated': time.time(), **status}))
+        except OSError as e:
+            print(f"Could not write resource status: {e}")
+
+    def processes(self) -> List[Dict[str, Any]]:
+        """Status reports of live processes; reports of exited ones are removed"""
+        reports = []
+        for path in sorted((self.state_dir / 'status').glob('*.json')):
+            try:
+                report = json.loads(path.read_text())
+                os.kill(report['pid'], 0)
+            except ProcessLookupError:
+                path.unlink(missing_ok=True)
+                continue
+            except (OSError, ValueError, KeyError):
+                continue
+            report['rss_mb'] = _rss_mb(report['pid'])
+            reports.append(report)
+        return reports
+
+
+def status():
+    config = Config()
+    governor = ResourceGovernor()
+    settings = governor.settings
+    whisper = config.whisper
+
+    cores = governor.cores()
+    pinned = f"pinned to cores {cores}" if settings['cpu_affinity'] else f"all {len(cores)} cores"
+    threads = f"{governor.threads()}" + ("" if whisper['threads'] else " (auto)")
+    print(f"CPU:     {pinned}, {threads} threads per decode")
+
+    available = available_memory_mb()
+    memory = f"{available:.0f} MB available" if available is not None else "available memory unknown"
+    print(f"Memory:  {memory}, models may use {settings['memory_fraction']:.0%}")
+    if whisper['model_size'] == 'auto':
+        model, reason = governor.choose_model(whisper['backend'])
+        print(f"Model:   auto -> {model} ({reason})")
+    else:
+        print(f"Model:   {whisper['model_size']} ({whisper['backend']})")
+    idle = settings['idle_unload_minutes']
+    print(f"Idle:    {'unload after ' + format(idle, 'g') + ' min' if idle else 'models stay loaded'}")
+
+    processes = governor.processes()
+    if processes:
+        print("Transcribers:")
+    for report in processes:
+        state = 'loaded' if report.get('loaded') else 'unloaded'
+        rss = f", RSS {report['rss_mb']:.0f} MB" if report.get('rss_mb') is not None else ""
+        since = time.time() - report['updated']
+        print(f"  pid {report['pid']:<8}{report.get('model_size')} ({report.get('backend')}) {state}, "
+              f"{report.get('threads')} threads{rss}, {since / 60:.0f} min since last change")
+
+    measured = governor._read_rtf()
+    if measured:
+        print("Measured real-time factors:")
+    for key, entry in sorted(measured.items()):
+        print(f"  {key:<24}{entry['rtf']:.3f} over {entry['count']} decodes")
+
+
+if __name__ == "__main__":
+    status()
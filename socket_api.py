@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Local transcription API over a Unix domain socket.
+
+The running service listens on api.socket_path (by default
+$XDG_RUNTIME_DIR/voxtalkinux.sock) so scripts and editor plugins can use its
+warm model instead of loading their own. The protocol is JSON lines: the
+client sends one request line, optionally followed by raw audio bytes, and
+reads response lines until one has "text" or "error".
+
+    {"op": "transcribe", "path": "/abs/file.wav"}
+    {"op": "transcribe", "pcm": {"bytes": N, "sample_rate": 44100, "channels": 2,
+                                 "format": "s16le"}, "stream": true}   + N bytes
+    {"op": "status"}
+
+A "prompt" (preceding text) and a "language" code may be added to a
+transcribe request; without a language it is detected.
+
+With "stream": true, a {"partial": ..., "start": ..., "end": ...} line is
+sent for every piece as it is decoded: the whole recording up to 30
+seconds, longer ones split at pauses into pieces of up to 30 seconds. When
+api.max_queue jobs are already admitted, a new one waits up to
+api.queue_timeout seconds for a slot and is then refused with
+{"error": ..., "code": "busy"}.
+
+As a client:
+
+    python socket_api.py FILE... [--stream]
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+from config_loader import Config
+
+# Longest request line accepted; audio travels after it, not inside it
+MAX_HEADER_BYTES = 64 * 1024
+PCM_FORMATS = {'s16le': ('<i2', 32768.0), 's32le': ('<i4', 2147483648.0), 'f32le': ('<f4', 1.0)}
+
+
+class RequestError(Exception):
+    """A request the server refuses; code is sent back to the client"""
+
+    def __init__(self, message: str, code: str = 'bad_request'):
+        super().__init__(message)
+        self.code = code
+
+
+def socket_path() -> Path:
+    configured = Config().api['socket_path']
+    if configured:
+        return Path(os.path.expanduser(configured))
+    runtime = os.environ.get('XDG_RUNTIME_DIR') or os.path.expanduser('~/.cache/voxtalkinux')
+    return Path(runtime) / 'voxtalkinux.sock'
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_Server"
+
+    def send(self, message: Dict[str, Any]):
+        self.wfile.write(json.dumps(message).encode() + b'\n')
+        self.wfile.flush()
+
+    def handle(self):
+        api = self.server.api
+        try:
+            line = self.rfile.readline(MAX_HEADER_BYTES + 1)
+            if not line:
+                return
+            if len(line) > MAX_HEADER_BYTES:
+                raise RequestError("request line too long")
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise RequestError("request is not valid JSON")
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            op = request.get('op')
+            if op == 'status':
+                self.send(api.status())
+            elif op == 'transcribe':
+                api.transcribe(request, self.rfile, self.send)
+            else:
+                raise RequestError(f"unknown op {op!r}")
+        except RequestError as e:
+            self.send({'error': str(e), 'code': e.code})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client went away
+        except Exception as e:
+            try:
+                self.send({'error': f"{type(e).__name__}: {e}", 'code': 'failed'})
+            except OSError:
+                pass
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    api: "SocketAPI"
+
+
+class SocketAPI:
+    """
+    Serve transcription requests from other local programs.
+
+    Every client connection gets its own thread, but at most api.max_queue
+    jobs are admitted at once; the rest wait for a slot (backpressure) and
+    give up with "busy" after api.queue_timeout. Jobs go to the shared
+    transcriber at low priority, so the user's own dictation stays first.
+    """
+
+    def __init__(self, transcriber, vad=None, long_form=None):
+        """
+        Args:
+            transcriber: Transcriber or TranscriptionWorker holding the warm model
+            vad: VoiceActivityDetector used to trim and split the audio
+            long_form: ParallelTranscriber for long recordings, if available
+        """
+        self.config = Config()
+        self.transcriber = transcriber
+        self.vad = vad
+        self.long_form = long_form
+        self._slots = threading.BoundedSemaphore(self.settings['max_queue'])
+        self._active = 0
+        self._active_lock = threading.Lock()
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.path = socket_path()
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.config.api
+
+    def start(self) -> bool:
+        """Listen on the socket; False if another instance already serves it"""
+        if self._server is not None:
+            return True
+        if self.path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self.path))
+                print(f"Transcription API already served at {self.path}, not starting another")
+                return False
+            except OSError:
+                self.path.unlink()  # Left behind by a process that died
+            finally:
+                probe.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Only this user may connect
+        old_umask = os.umask(0o177)
+        try:
+            self._server = _Server(str(self.path), _Handler)
+        finally:
+            os.umask(old_umask)
+        self._server.api = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"Transcription API listening on {self.path}")
+        return True
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'ready': self.transcriber.ready,
+            'active': self._active,  # Jobs admitted and not yet answered
+            'max_queue': self.settings['max_queue']
+        }
+
+    def transcribe(self, request: Dict[str, Any], rfile, send):
+        """Handle one transcribe request; runs on the connection's thread"""
+        # Audio is only read once a slot is free: until then a sending client
+        # blocks on the full socket buffer instead of filling our memory
+        if not self._slots.acquire(timeout=self.settings['queue_timeout']):
+            raise RequestError("transcription queue is full, try again later", code='busy')
+        with self._active_lock:
+            self._active += 1
+        try:
+            audio = self._read_audio(request, rfile)
+            language = request.get('language')
+            if language is not None and not isinstance(language, str):
+                raise RequestError("language must be a language code such as 'en'")
+            send(self._decode(audio, request.get('prompt'), language,
+                              send if request.get('stream') else None))
+        finally:
+            with self._active_lock:
+                self._active -= 1
+            self._slots.release()
+
+    def _read_audio(self, request: Dict[str, Any], rfile):
+        """The request's audio as 16 kHz float32, whatever form it came in"""
+        import numpy as np
+        from audio_recorder import load_wav, to_whisper_format, WHISPER_SAMPLE_RATE
+
+        max_seconds = self.settings['max_audio_seconds']
+        if 'path' in request:
+            path = Path(str(request['path']))
+            if not path.is_absolute() or not path.is_file():
+                raise RequestError("path must be an absolute path to an existing file")
+            if path.suffix.lower() == '.wav':
+                audio = load_wav(path)
+            else:
+                audio = self._load_with_ffmpeg(path, max_seconds)
+        elif 'pcm' in request:
+            pcm = request['pcm']
+            if not isinstance(pcm, dict):
+                raise RequestError("pcm must be an object")
+            size = pcm.get('bytes')
+            sample_rate = pcm.get('sample_rate', WHISPER_SAMPLE_RATE)
+            channels = pcm.get('channels', 1)
+            fmt = pcm.get('format', 's16le')
+            if fmt not in PCM_FORMATS:
+                raise RequestError(f"pcm.format must be one of {', '.join(PCM_FORMATS)}")
+            if not all(isinstance(v, int) and v > 0 for v in (size, sample_rate, channels)):
+                raise RequestError("pcm.bytes, pcm.sample_rate and pcm.channels must be positive integers")
+            dtype, scale = PCM_FORMATS[fmt]
+            frame_bytes = np.dtype(dtype).itemsize * channels
+            if size % frame_bytes:
+                raise RequestError("pcm.bytes is not a whole number of frames")
+            if size / frame_bytes / sample_rate > max_seconds:
+                raise RequestError(f"audio longer than {max_seconds:g} seconds", code='too_large')
+            data = rfile.read(size)
+            if len(data) != size:
+                raise RequestError("connection closed before all audio arrived")
+            samples = np.frombuffer(data, dtype=dtype).astype(np.float32) / scale
+            audio = to_whisper_format(samples.reshape(-1, channels), sample_rate)
+        else:
+            raise RequestError("transcribe needs 'path' or 'pcm'")
+        if audio.size > max_seconds * WHISPER_SAMPLE_RATE:
+            raise RequestError(f"audio longer than {max_seconds:g} seconds", code='too_large')
+        return audio
+
+    @staticmethod
+    def _load_with_ffmpeg(path: Path, max_seconds: float):
+        """Decode any format ffmpeg reads to 16 kHz mono, refusing it once it runs past max_seconds"""
+        import numpy as np
+        from audio_recorder import WHISPER_SAMPLE_RATE
+
+        limit = int(max_seconds * WHISPER_SAMPLE_RATE) * 2  # 16-bit samples
+        try:
+            process = subprocess.Popen(
+                ['ffmpeg', '-nostdin', '-threads', '0', '-i', str(path), '-f', 's16le',
+                 '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(WHISPER_SAMPLE_RATE), '-'],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        except FileNotFoundError:
+            raise RequestError("decoding this format needs ffmpeg, send WAV or PCM instead")
+        try:
+            # Read one byte past the limit, so a long file is refused without decoding all of it
+            data = process.stdout.read(limit + 1)
+        finally:
+            process.kill()
+            process.wait()
+        if len(data) > limit:
+            raise RequestError(f"audio longer than {max_seconds:g} seconds", code='too_large')
+        if not data and process.returncode not in (0, -9):
+            raise RequestError("ffmpeg could not decode the file")
+        return np.frombuffer(data[:len(data) // 2 * 2], dtype='<i2').astype(np.float32) / 32768
+
+    def _call(self, method: str, *args, **kwargs):
+        from transcription_worker import TranscriptionWorker, PRIORITY_LOW
+
+        if isinstance(self.transcriber, TranscriptionWorker):
+            kwargs['priority'] = PRIORITY_LOW
+        return getattr(self.transcriber, method)(*args, **kwargs)
+
+    def _decode(self, audio, prompt: Optional[str], language: Optional[str] = None,
+                send=None) -> Dict[str, Any]:
+        """Decode piece by piece (see VoiceActivityDetector.decode_ranges), sending partials if send is given"""
+        from audio_recorder import WHISPER_SAMPLE_RATE
+
+        if send is None and self.long_form is not None and self.long_form.wants(audio):
+            result = self.long_form.transcribe_segments(audio, language)
+            return {'text': result['text'], 'segments': result['segments']}
+
+        if self.vad is not None and self.config.vad['enabled']:
+            pieces = self.vad.decode_ranges(audio)
+        else:
+            pieces = [(0, audio.size)]
+        texts = []
+        segments = []
+        for start, end in pieces:
+            # The previous pieces are context, as in VoiceTranscriber._transcribe
+            context = " ".join(texts)[-200:] or prompt
+            result = self._call('transcribe_segments', audio[start:end], initial_prompt=context,
+                                language=language)
+            text = result['text'].strip()
+            if not text:
+                continue
+            # Detected once per request, not once per piece
+            language = language or result.get('language')
+            texts.append(text)
+            offset = start / WHISPER_SAMPLE_RATE
+            segments.extend(
+                {'start': s['start'] + offset, 'end': s['end'] + offset, 'text': s['text']}
+                for s in result['segments']
+            )
+            if send is not None:
+                send({'partial': text, 'start': round(offset, 3), 'end': round(end / WHISPER_SAMPLE_RATE, 3)})
+        return {'text': " ".join(texts), 'segments': segments}
+
+
+def request(message: Dict[str, Any], payload: bytes = b'', on_partial=None) -> Dict[str, Any]:
+    """
+    Send one request to the running service and wait for its answer
+
+    Returns:
+        The final response ({"text": ...} or {"error": ...})
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path()))
+        try:
+            sock.sendall(json.dumps(message).encode() + b'\n' + payload)
+        except BrokenPipeError:
+            pass  # Refused before the audio was read; the reason is in the response
+        with sock.makefile('rb') as responses:
+            for line in responses:
+                response = json.loads(line)
+                if 'partial' in response:
+                    if on_partial is not None:
+                        on_partial(response)
+                    continue
+                return response
+    return {'error': "connection closed without an answer", 'code': 'failed'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe files with the running VoxTalkinux service")
+    parser.add_argument('files', nargs='*', help="audio files (WAV, or anything ffmpeg reads)")
+    parser.add_argument('--stream', action='store_true', help="print each piece of up to 30 s as soon as it is decoded")
+    parser.add_argument('--status', action='store_true', help="show the service's queue instead")
+    args = parser.parse_args()
+
+    try:
+        if args.status or not args.files:
+            print(json.dumps(request({'op': 'status'})))
+            return
+        for path in args.files:
+            response = request(
+                {'op': 'transcribe', 'path': os.path.abspath(path), 'stream': args.stream},
+                on_partial=lambda partial: print(f"[{partial['start']:.1f}s] {partial['partial']}", flush=True)
+            )
+            if 'error' in response:
+                print(f"{path}: {response['error']}", file=sys.stderr)
+            elif not args.stream:
+                print(response['text'])
+    except (FileNotFoundError, ConnectionRefusedError):
+        sys.exit(f"VoxTalkinux is not running (no socket at {socket_path()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import threading
+import numpy as np
+from typing import Callable, List, Optional
+from config_loader import Config
+from audio_recorder import AudioRecorder, WHISPER_SAMPLE_RATE
+from transcriber import Transcriber
+from language import LanguageChoice, LanguageSelector
+
+class StreamingTranscriber:
+    """
+    Decode a recording incrementally while the hotkey is still held.
+
+    A background thread periodically re-decodes the audio after the committed
+    prefix. Segments that come back identical on two consecutive passes and end
+    well before the live edge are committed, and the decode window moves past
+    them. Everything else stays a tentative suffix, so at stop time only the
+    last few seconds still have to be decoded.
+
+    One instance serves one recording: its committed text lives until
+    finish() runs on the processing thread, possibly after the next
+    recording has already started with an instance of its own.
+    """
+
+    def __init__(self, transcriber: Transcriber, recorder: AudioRecorder,
+                 on_update: Optional[Callable[[str, str], None]] = None,
+                 languages: Optional[LanguageSelector] = None):
+        self.config = Config()
+        self.transcriber = transcriber
+        self.recorder = recorder
+        self.on_update = on_update
+        self.languages = languages
+        self._language = LanguageChoice(None, 'detect')
+        self._thread = None
+        self._stop = threading.Event()
+        self._reset()
+
+    def _reset(self):
+        self.committed: List[str] = []
+        self.tentative = ""
+        self._committed_samples = 0
+        self._previous: List[str] = []
+
+    @property
+    def text(self) -> str:
+        """Committed prefix followed by the current tentative suffix"""
+        return " ".join(self.committed + ([self.tentative] if self.tentative else []))
+
+    def start(self):
+        """Start decoding in the background; call after AudioRecorder.start_recording"""
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError("Streaming transcriber is already running")
+        self._reset()
+        if self.languages is not None:
+            # Chosen once, so passes after the first don't detect again
+            self._language = self.languages.choose()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background passes (waiting for one in progress); the committed text is kept"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def finish(self, audio: Optional[np.ndarray]) -> str:
+        """
+        Stop the background worker and decode whatever is left
+
+        Args:
+            audio: Full recording as returned by AudioRecorder.stop_recording
+
+        Returns:
+            Transcribed text for the whole recording
+        """
+        self.stop()
+
+        if audio is not None:
+            tail = audio[self._committed_samples:]
+            if self.config.vad['enabled']:
+                tail = self.recorder.vad.trim(tail)
+            if tail.size:
+                result = self._decode(tail)
+                text = result["text"].strip()
+                if text:
+                    self.committed.append(text)
+        self.tentative = ""
+        return self.text
+
+    def _run(self):
+        settings = self.config.streaming
+        while not self._stop.wait(settings['interval']):
+            try:
+                self._step(self.recorder.get_audio())
+            except Exception as e:
+                # A failed pass only costs us the head start; finish() still decodes
+                print(f"Streaming pass failed: {e}")
+
+    def _step(self, audio: np.ndarray):
+        """Decode the uncommitted window once and commit whatever has stabilised"""
+        settings = self.config.streaming
+        window = audio[self._committed_samples:]
+        duration = window.size / WHISPER_SAMPLE_RATE
+        if duration < settings['min_window'] or self._stop.is_set():
+            return
+
+        result = self._decode(window)
+        segments = [s for s in result["segments"] if s["text"].strip()]
+
+        # Never commit inside the tail, the speaker may still be mid-word there
+        horizon = duration - settings['tentative_seconds']
+        # Past max_window we commit on timing alone to keep each pass bounded
+        force = duration >= settings['max_window']
+
+        stable = 0
+        for i, segment in enumerate(segments):
+            if segment["end"] > horizon:
+                break
+            agreed = i < len(self._previous) and self._previous[i] == segment["text"].strip()
+            if not (agreed or force):
+                break
+            stable = i + 1
+
+        if stable:
+            self.committed.extend(s["text"].strip() for s in segments[:stable])
+            self._committed_samples += int(segments[stable - 1]["end"] * WHISPER_SAMPLE_RATE)
+
+        self._previous = [s["text"].strip() for s in segments[stable:]]
+        self.tentative = " ".join(self._previous)
+
+        if self.on_update:
+            self.on_update(" ".join(self.committed), self.tentative)
+
+    def _decode(self, audio: np.ndarray):
+        result = self.transcriber.transcribe_segments(
+            audio, initial_prompt=self._prompt(), language=self._language.language
+        )
+        if self.languages is not None:
+            self._language = self.languages.update(self._language, result)
+        return result
+
+    def _prompt(self) -> Optional[str]:
+        """Tail of the committed text, given to Whisper as context for the next window"""
+        if not self.committed:
+            return None
+        return " ".join(self.committed)[-200:]
@@ -0,0 +1,116 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+try:
+    from audio_recorder import (AudioConditioner, CaptureBuffer, PrerollBuffer, ScratchBuffer,
+                                VoiceActivityDetector, to_whisper_format, WHISPER_SAMPLE_RATE)
+except (ImportError, OSError) as e:  # sounddevice without PortAudio raises OSError
+    pytest.skip(f"audio stack unavailable: {e}", allow_module_level=True)
+from config_loader import Config
+
+
+def column(values):
+    return np.asarray(values, dtype=np.float32).reshape(-1, 1)
+
+
+def test_capture_buffer_grows_past_its_initial_size():
+    buffer = CaptureBuffer(1, 4)
+    samples = np.arange(300, dtype=np.float32)
+    for start in range(0, samples.size, 7):
+        buffer.write(column(samples[start:start + 7]))
+    buffer.close()
+    assert len(buffer) == samples.size
+    np.testing.assert_array_equal(buffer.view()[:, 0], samples)
+
+
+def test_capture_buffer_views_survive_growth():
+    buffer = CaptureBuffer(2, 4)
+    buffer.write(np.ones((3, 2), dtype=np.float32))
+    early = buffer.view()
+    for _ in range(50):
+        buffer.write(np.zeros((5, 2), dtype=np.float32))
+    buffer.close()
+    np.testing.assert_array_equal(early, np.ones((3, 2)))
+    np.testing.assert_array_equal(buffer.view(1)[:2], [[1, 1], [1, 1]])
+
+
+def drained(preroll):
+    buffer = CaptureBuffer(1, 16)
+    preroll.drain_into(buffer)
+    buffer.close()
+    return buffer.view()[:, 0].tolist()
+
+
+def test_preroll_keeps_the_most_recent_audio_in_order():
+    preroll = PrerollBuffer(1, 5)
+    for block in ([0, 1, 2], [3, 4, 5], [6, 7]):
+        preroll.write(column(block))
+    assert drained(preroll) == [3, 4, 5, 6, 7]
+
+
+def test_preroll_before_it_has_wrapped():
+    preroll = PrerollBuffer(1, 5)
+    preroll.write(column([1, 2]))
+    assert drained(preroll) == [1, 2]
+
+
+def test_preroll_block_larger_than_the_ring():
+    preroll = PrerollBuffer(1, 5)
+    preroll.write(column([9]))
+    preroll.write(column(range(12)))
+    assert drained(preroll) == [7, 8, 9, 10, 11]
+
+
+def test_preroll_is_empty_after_draining():
+    preroll = PrerollBuffer(1, 5)
+    preroll.write(column(range(8)))
+    drained(preroll)
+    assert drained(preroll) == []
+    preroll.write(column([5, 6]))
+    assert drained(preroll) == [5, 6]
+
+
+def test_scratch_buffer_reuses_its_array():
+    scratch = ScratchBuffer(8)
+    first = scratch.like(np.zeros((4, 2), dtype=np.float32))
+    assert first.shape == (4, 2)
+    second = scratch.like(np.zeros(6, dtype=np.float32))
+    assert np.shares_memory(first, second)
+    assert scratch.like(np.zeros(20, dtype=np.float32)).shape == (20,)
+
+
+@pytest.fixture
+def plain_conditioning(monkeypatch):
+    """Resampling and downmixing only, so the output can be compared with to_whisper_format"""
+    audio = Config().audio
+    monkeypatch.setitem(audio, 'conditioning', {'dc_cutoff': 0, 'normalize': False, 'limit': False})
+
+
+@pytest.mark.parametrize('sample_rate, channels', [(48000, 1), (44100, 2), (16000, 1)])
+def test_chunked_conditioning_matches_whole_recording(plain_conditioning, sample_rate, channels):
+    rng = np.random.default_rng(0)
+    recording = (rng.standard_normal((int(2.3 * sample_rate), channels)) * 0.1).astype(np.float32)
+    source = CaptureBuffer(channels, 1024)
+    conditioner = AudioConditioner(source, sample_rate, WHISPER_SAMPLE_RATE)
+    # Converted as the audio callback delivers it, without the helper thread's timing
+    for start in range(0, len(recording), 1000):
+        source.write(recording[start:start + 1000])
+        if start % 5000 == 0:
+            conditioner._step()
+    source.close()
+
+    chunked = conditioner.finish()
+    whole = to_whisper_format(recording, sample_rate)
+    assert chunked.shape == whole.shape
+    np.testing.assert_allclose(chunked, whole, atol=1e-6)
+
+
+def test_decode_ranges_trims_a_short_recording_without_splitting():
+    silence = np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32)
+    speech = np.full(WHISPER_SAMPLE_RATE, 0.2, dtype=np.float32)
+    audio = np.concatenate([silence, speech, silence, speech, silence])
+    ranges = VoiceActivityDetector().decode_ranges(audio)
+    assert len(ranges) == 1
+    start, end = ranges[0]
+    assert 0 < start < WHISPER_SAMPLE_RATE < 4 * WHISPER_SAMPLE_RATE < end < audio.size
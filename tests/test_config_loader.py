@@ -0,0 +1,74 @@
+import copy
+import yaml
+from config_loader import Config, validate
+
+
+def shipped():
+    with open(Config().path) as f:
+        return yaml.safe_load(f)
+
+
+def test_shipped_config_is_valid():
+    assert validate(shipped()) == []
+
+
+def test_top_level_must_be_a_mapping():
+    assert validate(['hotkey']) == ["top level must be a mapping"]
+
+
+def test_missing_required_section():
+    config = shipped()
+    del config['audio']
+    assert validate(config) == ["missing required section 'audio'"]
+
+
+def test_wrong_type():
+    config = shipped()
+    config['audio']['sample_rate'] = '16k'
+    assert validate(config) == ["audio.sample_rate has the wrong type (str)"]
+
+
+def test_bool_is_not_a_number():
+    config = shipped()
+    config['whisper']['threads'] = True
+    assert validate(config) == ["whisper.threads has the wrong type (bool)"]
+
+
+def test_choice_outside_the_allowed_values():
+    config = shipped()
+    config['output']['type'] = 'print'
+    assert validate(config) == ["output.type must be one of type, clipboard, auto, not 'print'"]
+
+
+def test_overlap_must_be_shorter_than_chunk():
+    config = shipped()
+    for overlap in (30.0, 45):
+        config['long_form'].update(chunk_seconds=30.0, overlap_seconds=overlap)
+        assert validate(config) == ["long_form.overlap_seconds must be shorter than chunk_seconds"]
+
+
+def test_vocabulary_pattern_must_compile():
+    config = shipped()
+    config['vocabulary']['profiles'] = {'code': {'patterns': [['ok', 'fine'], ['(unclosed', 'x']]}}
+    errors = validate(config)
+    assert len(errors) == 1
+    assert errors[0].startswith("vocabulary.profiles.code: patterns[1] is not a valid regex")
+
+
+def test_vocabulary_pattern_must_be_a_pair():
+    config = shipped()
+    config['vocabulary']['profiles'] = {'code': {'patterns': ['zz']}}
+    assert validate(config) == ["vocabulary.profiles.code: patterns[0] must be a [regex, replacement] pair"]
+
+
+def test_language_profiles_need_a_language():
+    config = shipped()
+    config['language'] = {'profiles': [{'name': 'German', 'language': 'de'}, {'name': 'French'}]}
+    assert validate(config) == ["language.profiles[1] must be a mapping with a 'language'"]
+
+
+def test_validate_leaves_the_config_alone():
+    config = shipped()
+    before = copy.deepcopy(config)
+    validate(config)
+    assert config == before
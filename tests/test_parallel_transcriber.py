@@ -0,0 +1,86 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+try:
+    from parallel_transcriber import plan_chunks, stitch, _drop_repeated_words
+except (ImportError, OSError) as e:  # sounddevice without PortAudio raises OSError
+    pytest.skip(f"audio stack unavailable: {e}", allow_module_level=True)
+
+SR = 16000
+
+
+class FixedVAD:
+    """Stands in for VoiceActivityDetector with known speech ranges, in seconds"""
+
+    def __init__(self, *ranges):
+        self.ranges = [(int(start * SR), int(end * SR)) for start, end in ranges]
+
+    def split(self, audio):
+        return self.ranges
+
+
+def seconds(chunks):
+    return [(start / SR, end / SR) for start, end in chunks]
+
+
+def test_short_audio_is_one_chunk():
+    assert seconds(plan_chunks(np.zeros(10 * SR), None, 30, 1)) == [(0, 10)]
+
+
+def test_speech_without_pauses_is_cut_with_overlap():
+    chunks = plan_chunks(np.zeros(70 * SR), None, 30, 1)
+    assert seconds(chunks) == [(0, 30), (29, 59), (58, 70)]
+
+
+@pytest.mark.parametrize('overlap', [30, 31])
+def test_overlap_not_shorter_than_chunk_is_refused(overlap):
+    # Used to loop forever: the fixed cuts never moved forward
+    with pytest.raises(ValueError):
+        plan_chunks(np.zeros(70 * SR), None, 30, overlap)
+
+
+def test_pauses_are_merged_up_to_the_chunk_length():
+    vad = FixedVAD((0, 10), (12, 25), (27, 40), (41, 50))
+    chunks = plan_chunks(np.zeros(50 * SR), vad, 30, 1)
+    assert seconds(chunks) == [(0, 25), (27, 50)]
+
+
+def test_long_utterance_between_pauses_is_cut():
+    vad = FixedVAD((0, 5), (6, 70))
+    chunks = plan_chunks(np.zeros(70 * SR), vad, 30, 1)
+    assert seconds(chunks) == [(0, 5), (6, 36), (35, 65), (64, 70)]
+
+
+def test_no_speech_means_no_chunks():
+    assert plan_chunks(np.zeros(70 * SR), FixedVAD(), 30, 1) == []
+
+
+def test_stitch_offsets_timestamps_and_joins_text():
+    chunks = [(0, 25 * SR), (27 * SR, 50 * SR)]
+    results = [
+        [{"start": 0.0, "end": 4.0, "text": " Hello there."}],
+        [{"start": 1.0, "end": 3.0, "text": " General Kenobi."}],
+    ]
+    result = stitch(chunks, results)
+    assert result["text"] == "Hello there. General Kenobi."
+    assert [(s["start"], s["end"]) for s in result["segments"]] == [(0.0, 4.0), (28.0, 30.0)]
+
+
+def test_stitch_keeps_each_side_of_an_overlap_once():
+    chunks = [(0, 30 * SR), (29 * SR, 59 * SR)]
+    results = [
+        # Midpoint 29.0 lies before the middle of the overlap (29.5)
+        [{"start": 20.0, "end": 28.0, "text": " we went to the"}, {"start": 28.5, "end": 29.5, "text": " edge"}],
+        # Midpoint 29.3 in absolute time: also before the middle, so the first chunk's copy wins
+        [{"start": 0.1, "end": 0.5, "text": " edge"}, {"start": 1.0, "end": 5.0, "text": " edge of the map"}],
+    ]
+    result = stitch(chunks, results)
+    assert result["text"] == "we went to the edge of the map"
+    assert [s["start"] for s in result["segments"]] == [20.0, 28.5, 30.0]
+
+
+def test_drop_repeated_words():
+    assert _drop_repeated_words("we went to the", "To the store.") == "store."
+    assert _drop_repeated_words("we went to the", "store it") == "store it"
+    assert _drop_repeated_words("", "store") == "store"
+    assert _drop_repeated_words("same words", "same words") == ""
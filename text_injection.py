@@ -0,0 +1,370 @@
+import shutil
+import subprocess
+import time
+from typing import Dict, List, Optional
+from config_loader import Config
+
+# Terminals paste with Ctrl+Shift+V; Ctrl+V would send a literal ^V
+TERMINAL_CLASSES = {
+    'gnome-terminal-server', 'gnome-terminal', 'konsole', 'xterm', 'uxterm', 'urxvt',
+    'alacritty', 'kitty', 'terminator', 'tilix', 'xfce4-terminal', 'wezterm',
+    'st-256color', 'st', 'lxterminal', 'mate-terminal', 'qterminal', 'guake', 'yakuake'
+}
+
+# Keys sent between two X syncs (or two xdotool invocations)
+CHUNK_SIZE = 64
+
+
+def load_pyautogui():
+    """Import PyAutoGUI on first use; it connects to the X server on import"""
+    import pyautogui
+    # Ensure PyAutoGUI fails safe
+    pyautogui.FAILSAFE = True
+    pyautogui.PAUSE = 0
+    return pyautogui
+
+
+class InjectionError(Exception):
+    """Raised when text injection stops partway; typed says how far it got"""
+
+    def __init__(self, message: str, typed: int = 0):
+        super().__init__(message)
+        self.typed = typed
+
+
+class XTestInjector:
+    """Send key events through the XTEST extension (python-xlib), batched per chunk"""
+
+    name = 'xtest'
+
+    def __init__(self):
+        from Xlib import X, XK
+        from Xlib.display import Display
+        from Xlib.ext import xtest
+
+        self._X = X
+        self._xtest = xtest
+        self.display = Display()
+        if not self.display.has_extension('XTEST'):
+            raise RuntimeError("X server has no XTEST extension")
+        self._shift = self.display.keysym_to_keycode(XK.XK_Shift_L)
+        self._special = {'\n': XK.XK_Return, '\t': XK.XK_Tab}
+        self._keys: Dict[str, Optional[tuple]] = {}
+
+    def _key(self, char: str) -> Optional[tuple]:
+        """(keycode, needs_shift) for char in the current keymap, or None"""
+        if char not in self._keys:
+            codepoint = ord(char)
+            if char in self._special:
+                keysym = self._special[char]
+            elif 0x20 <= codepoint <= 0x7e or 0xa0 <= codepoint <= 0xff:
+                keysym = codepoint  # Latin-1 keysyms equal their code points
+            else:
+                keysym = 0x01000000 | codepoint
+            keycode = self.display.keysym_to_keycode(keysym)
+            key = None
+            if keycode:
+                if self.display.keycode_to_keysym(keycode, 0) == keysym:
+                    key = (keycode, False)
+                elif self.display.keycode_to_keysym(keycode, 1) == keysym:
+                    key = (keycode, True)
+            self._keys[char] = key
+        return self._keys[char]
+
+    def supports(self, text: str) -> bool:
+        return all(self._key(char) is not None for char in text)
+
+    def _tap(self, keycode: int, shift: bool = False):
+        fake_input = self._xtest.fake_input
+        if shift:
+            fake_input(self.display, self._X.KeyPress, self._shift)
+        fake_input(self.display, self._X.KeyPress, keycode)
+        fake_input(self.display, self._X.KeyRelease, keycode)
+        if shift:
+            fake_input(self.display, self._X.KeyRelease, self._shift)
+
+    def type(self, text: str, delay: float) -> int:
+        typed = 0  # Characters the server has confirmed
+        tapped = 0  # Characters whose key events were queued
+        try:
+            for start in range(0, len(text), 1 if delay else CHUNK_SIZE):
+                chunk = text[start:start + (1 if delay else CHUNK_SIZE)]
+                for char in chunk:
+                    keycode, shift = self._key(char)
+                    self._tap(keycode, shift)
+                    tapped += 1
+                self.display.sync()
+                typed = tapped
+                if delay:
+                    time.sleep(delay)
+        except Exception as e:
+            # Deliver what was queued before the failure, so the count is exact either way
+            try:
+                self.display.sync()
+                typed = tapped
+            except Exception:
+                pass  # Connection gone: nothing after the last sync arrived
+            raise InjectionError(f"XTEST injection failed: {e}", typed)
+        return typed
+
+    def erase(self, count: int):
+        from Xlib import XK
+        backspace = self.display.keysym_to_keycode(XK.XK_BackSpace)
+        for _ in range(count):
+            self._tap(backspace)
+        self.display.sync()
+
+    def paste_keystroke(self, terminal: bool):
+        from Xlib import XK
+        control = self.display.keysym_to_keycode(XK.XK_Control_L)
+        fake_input = self._xtest.fake_input
+        fake_input(self.display, self._X.KeyPress, control)
+        self._tap(self.display.keysym_to_keycode(XK.XK_v), shift=terminal)
+        fake_input(self.display, self._X.KeyRelease, control)
+        self.display.sync()
+
+
+class XdotoolInjector:
+    """
+    Type through `xdotool type`, one process per chunk.
+
+    Progress is counted per chunk: a process that fails partway doesn't say
+    how much of its chunk it typed, so that chunk counts as not typed.
+    """
+
+    name = 'xdotool'
+
+    def __init__(self):
+        if shutil.which('xdotool') is None:
+            raise RuntimeError("xdotool is not installed")
+
+    def supports(self, text: str) -> bool:
+        return True
+
+    def type(self, text: str, delay: float) -> int:
+        typed = 0
+        for start in range(0, len(text), CHUNK_SIZE):
+            chunk = text[start:start + CHUNK_SIZE]
+            try:
+                subprocess.run(
+                    ['xdotool', 'type', '--clearmodifiers', '--delay', str(int(delay * 1000)), '--', chunk],
+                    check=True, capture_output=True, timeout=10 + len(chunk) * delay
+                )
+            except (OSError, subprocess.SubprocessError) as e:
+                raise InjectionError(f"xdotool failed: {e}", typed)
+            typed += len(chunk)
+        return typed
+
+    def erase(self, count: int):
+        subprocess.run(
+            ['xdotool', 'key', '--clearmodifiers', '--delay', '0', '--repeat', str(count), 'BackSpace'],
+            check=True, timeout=10
+        )
+
+    def paste_keystroke(self, terminal: bool):
+        keys = 'ctrl+shift+v' if terminal else 'ctrl+v'
+        subprocess.run(['xdotool', 'key', '--clearmodifiers', keys], check=True, timeout=5)
+
+
+class PyAutoGUIInjector:
+    """Last resort: pyautogui.write, one call per character so failures are counted exactly"""
+
+    name = 'pyautogui'
+
+    def __init__(self):
+        self.pyautogui = load_pyautogui()
+
+    def supports(self, text: str) -> bool:
+        # pyautogui silently drops characters it has no key name for
+        return all(char in self.pyautogui.KEYBOARD_KEYS or char == '\n' for char in text)
+
+    def type(self, text: str, delay: float) -> int:
+        typed = 0
+        for char in text:
+            try:
+                self.pyautogui.write(char)
+            except Exception as e:
+                raise InjectionError(f"pyautogui failed: {e}", typed)
+            typed += 1
+            if delay:
+                time.sleep(delay)
+        return typed
+
+    def erase(self, count: int):
+        self.pyautogui.press('backspace', presses=count)
+
+    def paste_keystroke(self, terminal: bool):
+        self.pyautogui.hotkey(*(['ctrl', 'shift', 'v'] if terminal else ['ctrl', 'v']))
+
+
+_INJECTORS = {injector.name: injector for injector in (XTestInjector, XdotoolInjector, PyAutoGUIInjector)}
+
+
+class TextInjector:
+    """
+    Put text into the focused window as fast as the target allows.
+
+    Strategies, fastest first:
+      paste      clipboard + Ctrl+V (Ctrl+Shift+V in terminals), restoring the
+                 previous clipboard; used for text of at least paste_threshold chars
+      xtest      batched XTEST key events through python-xlib
+      xdotool    `xdotool type` in chunks
+      pyautogui  pyautogui.write, one character at a time
+
+    output.typing.method pins one strategy; 'auto' picks per window class and
+    remembers strategies that failed there. Characters a keystroke strategy
+    has no key for (not in the keymap, say) go to the next strategy that has
+    one, and only those characters. Every strategy reports how far it got, so
+    a retry resumes at the first character that wasn't typed.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self._injectors: Dict[str, object] = {}
+        self._unavailable = set()
+        # window class -> strategies that failed in it
+        self._failed: Dict[Optional[str], set] = {}
+
+    @property
+    def settings(self):
+        return self.config.typing
+
+    def _injector(self, name: str):
+        if name in self._unavailable:
+            return None
+        if name not in self._injectors:
+            try:
+                self._injectors[name] = _INJECTORS[name]()
+            except Exception as e:
+                print(f"Text injection method '{name}' unavailable: {e}")
+                self._unavailable.add(name)
+                return None
+        return self._injectors[name]
+
+    def _keystroke_injector(self):
+        for name in ('xtest', 'xdotool', 'pyautogui'):
+            injector = self._injector(name)
+            if injector is not None:
+                return injector
+        return None
+
+    def strategies(self, text: str, window_class: Optional[str]) -> List[str]:
+        """Strategies to try for text in the given window, in order"""
+        method = self.settings['method']
+        if method != 'auto':
+            return [method]
+
+        order = ['xtest', 'xdotool', 'pyautogui']
+        if len(text) >= self.settings['paste_threshold']:
+            order.insert(0, 'paste')
+        failed = self._failed.get(window_class, set())
+        # Strategies that failed here before go last rather than away entirely
+        return [s for s in order if s not in failed] + [s for s in order if s in failed]
+
+    def inject(self, text: str, window_class: Optional[str] = None) -> int:
+        """
+        Inject text with the first strategy that works
+
+        Returns:
+            Number of characters injected; always len(text) on success
+
+        Raises:
+            InjectionError: with .typed set when every strategy failed
+        """
+        delay = self.settings['delay_between_chars']
+        typed = 0
+        error = None
+        strategies = self.strategies(text, window_class)
+        for i, name in enumerate(strategies):
+            remaining = text[typed:]
+            try:
+                if name == 'paste':
+                    typed += self._paste(remaining, window_class)
+                    return typed
+                injector = self._injector(name)
+                if injector is None:
+                    continue
+                if injector.supports(remaining):
+                    typed += injector.type(remaining, delay)
+                    return typed
+                fallbacks = [self._injector(n) for n in strategies[i + 1:] if n != 'paste']
+                fallbacks = [f for f in fallbacks if f is not None]
+                if not all(injector.supports(c) or any(f.supports(c) for f in fallbacks) for c in remaining):
+                    continue
+                typed += self._type_runs(injector, fallbacks, remaining, delay)
+                return typed
+            except InjectionError as e:
+                typed += e.typed
+                error = e
+            except Exception as e:
+                error = e
+            print(f"Text injection via {name} failed after {typed} chars: {error}")
+            self._failed.setdefault(window_class, set()).add(name)
+        raise InjectionError(f"No injection method succeeded: {error}", typed)
+
+    def _type_runs(self, injector, fallbacks: list, text: str, delay: float) -> int:
+        """Type text with injector, handing each run of characters it can't type to the first fallback that can"""
+        typed = 0
+        while typed < len(text):
+            end = typed
+            if injector.supports(text[typed]):
+                typer = injector
+                while end < len(text) and injector.supports(text[end]):
+                    end += 1
+            else:
+                typer = next(f for f in fallbacks if f.supports(text[typed]))
+                while end < len(text) and not injector.supports(text[end]) and typer.supports(text[end]):
+                    end += 1
+            try:
+                typed += typer.type(text[typed:end], delay)
+            except InjectionError as e:
+                raise InjectionError(f"{typer.name}: {e}", typed + e.typed)
+        return typed
+
+    def erase(self, count: int):
+        """Send count backspaces to the focused window"""
+        injector = self._keystroke_injector()
+        if injector is None:
+            raise InjectionError("no way to send key events")
+        injector.erase(count)
+
+    def _paste(self, text: str, window_class: Optional[str]) -> int:
+        """Paste through the clipboard, then put the previous clipboard contents back"""
+        import pyperclip
+
+        injector = self._keystroke_injector()
+        if injector is None:
+            raise RuntimeError("no way to send the paste keystroke")
+        try:
+            previous = pyperclip.paste()
+        except Exception:
+            previous = None
+        pyperclip.copy(text)
+        try:
+            injector.paste_keystroke(window_class in TERMINAL_CLASSES)
+            # The target reads the clipboard asynchronously after the keystroke
+            time.sleep(self.settings['paste_restore_delay'])
+        finally:
+            if previous is not None:
+                pyperclip.copy(previous)
+        return len(text)
+
+
+def active_window_class() -> Optional[str]:
+    """WM_CLASS of the focused window (lowercased), or None if it can't be determined"""
+    try:
+        from Xlib import X
+        from Xlib.display import Display
+
+        display = Display()
+        try:
+            root = display.screen().root
+            active = root.get_full_property(display.intern_atom('_NET_ACTIVE_WINDOW'), X.AnyPropertyType)
+            if not active or not active.value[0]:
+                return None
+            wm_class = display.create_resource_object('window', active.value[0]).get_wm_class()
+            return wm_class[1].lower() if wm_class else None
+        finally:
+            display.close()
+    except Exception:
+        return None
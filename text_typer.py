@@ -1,14 +1,10 @@
-import pyautogui
-import time
 from config_loader import Config
+from text_injection import TextInjector, active_window_class
 
 class TextTyper:
     def __init__(self):
         self.config = Config()
-        # Ensure PyAutoGUI fails safe
-        pyautogui.FAILSAFE = True
-        # No pause between actions
-        pyautogui.PAUSE = 0
+        self.injector = TextInjector()
 
     def type_text(self, text: str):
         """
@@ -20,14 +16,8 @@ class TextTyper:
         if not text:
             return
 
-        # Get typing configuration
-        delay = self.config.typing['delay_between_chars']
-        add_space = self.config.typing['add_trailing_space']
-
-        # Type the text character by character
-        for char in text:
-            pyautogui.write(char, interval=delay)
-
         # Add trailing space if configured
-        if add_space:
-            pyautogui.write(' ', interval=delay) 
\ No newline at end of file
+        if self.config.typing['add_trailing_space']:
+            text += ' '
+
+        self.injector.inject(text, active_window_class()) 
\ No newline at end of file
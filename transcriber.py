@@ -1,42 +1,241 @@
-import whisper
-from pathlib import Path
+import gc
+import threading
+import time
+import numpy as np
+from typing import Union, Optional, Dict, Any
 from config_loader import Config
+from whisper_backends import load_backend
+from latency import log_event
+from transcription_cache import TranscriptionCache
+from vocabulary import Vocabulary
+from resources import ResourceGovernor
+
+# Whisper's input rate; not imported from audio_recorder so the worker process needs no audio stack
+SAMPLE_RATE = 16000
+# Config sections read while decoding; a Transcriber in another process must reread them on change
+CONFIG_SECTIONS = frozenset({'whisper', 'vocabulary', 'cache', 'resources'})
 
 class Transcriber:
-    def __init__(self):
+    def __init__(self, background: bool = False, model_size: Optional[str] = None):
+        """
+        Args:
+            background: Load the model on a helper thread instead of blocking
+                here; decodes submitted meanwhile wait for it to finish
+            model_size: Use this model instead of whisper.model_size (e.g. a
+                draft model), other whisper settings still apply
+        """
         self.config = Config()
+        self.model_size = model_size
         self._model = None
-        self._model_size = None
-        self._load_model()
+        self._model_key = None
+        self._swap_thread = None
+        self._idle_timer = None
+        self.cache = TranscriptionCache()
+        self.vocabulary = Vocabulary()
+        self.governor = ResourceGovernor()
+        # Streaming passes and the final decode may run on different threads
+        self._lock = threading.RLock()
+        if background:
+            threading.Thread(target=self._load_model_locked, daemon=True).start()
+        else:
+            self._load_model()
+
+    @property
+    def ready(self) -> bool:
+        """Whether a model is loaded and decodes will start right away"""
+        return self._model is not None
+
+    def _load_model_locked(self):
+        with self._lock:
+            self._load_model()
+
+    def _settings(self) -> Dict[str, Any]:
+        settings = self.config.whisper
+        if self.model_size:
+            settings['model_size'] = self.model_size
+        elif settings['model_size'] == 'auto':
+            # The loaded model would be freed by a swap, so its memory is up for grabs too
+            resident = self._model_key[1] if self._model_key is not None else None
+            settings['model_size'], _ = self.governor.choose_model(settings['backend'], resident)
+        # Don't let one decode take every core of a shared machine
+        settings['threads'] = self.governor.threads()
+        return settings
+
+    def _wanted_key(self) -> tuple:
+        settings = self._settings()
+        # whisper.cpp picks greedy or beam search when the model is built, so switching needs a reload
+        beam_search = settings['backend'] == 'whisper.cpp' and (settings['beam_size'] or 1) > 1
+        return (settings['backend'], settings['model_size'], settings['compute_type'],
+                settings['threads'], beam_search)
+
+    def _build_model(self):
+        """Load a backend for the current config; returns (model, key)"""
+        settings = self._settings()
+        key = self._wanted_key()
+        # Before loading, so the engine's thread pool starts on the allowed cores
+        self.governor.pin()
+        start = time.monotonic()
+        model = load_backend(settings['backend'], settings['model_size'], settings)
+        log_event('model_load', time.monotonic() - start,
+                  backend=settings['backend'], model_size=settings['model_size'])
+        self._report(key, loaded=True)
+        return model, key
+
+    def _report(self, key: tuple, loaded: bool):
+        self.governor.report(backend=key[0], model_size=key[1], threads=key[3], loaded=loaded)
 
     def _load_model(self):
-        """Load or reload the Whisper model if needed"""
-        model_size = self.config.whisper['model_size']
-        if self._model is None or self._model_size != model_size:
-            self._model = whisper.load_model(model_size)
-            self._model_size = model_size
+        """Load the Whisper model if none is loaded yet; call with the lock held"""
+        if self._model is None:
+            self._model, self._model_key = self._build_model()
+
+    def _swap_model(self):
+        """Load a model for the current config, then replace the old one in one step"""
+        # Loaded outside the lock: the old model keeps serving decodes meanwhile
+        model, key = self._build_model()
+        with self._lock:
+            self._model, self._model_key = model, key
+        print(f"Switched to whisper model {key[1]} ({key[0]})")
+
+    def apply_config(self):
+        """
+        Pick up whisper settings changed by Config.reload
+
+        If the model needs replacing, the new one loads in the background and
+        is swapped in once ready; decodes keep using the old one until then.
+        """
+        if self._model is None or self._model_key == self._wanted_key():
+            return
+        if self._swap_thread is not None and self._swap_thread.is_alive():
+            return  # The running swap re-checks the config when it finishes
+        self._swap_thread = threading.Thread(target=self._swap_until_current, daemon=True)
+        self._swap_thread.start()
+
+    def _swap_until_current(self):
+        try:
+            # The config may have changed again while we were loading
+            while self._model_key != self._wanted_key():
+                self._swap_model()
+        except Exception as e:
+            print(f"Model swap failed, keeping the current model: {e}")
+
+    def _decode(self, audio: Union[str, np.ndarray], initial_prompt: Optional[str] = None,
+                language: Optional[str] = None) -> Dict[str, Any]:
+        """Run Whisper on a file path or a 16 kHz float32 buffer"""
+        model_size = (self._model_key or self._wanted_key())[1]
+        language = language or self.config.whisper['language'] or None
+        # The profile's glossary goes in front of the context; English-only models tokenize differently
+        initial_prompt = self.vocabulary.prompt(initial_prompt, multilingual=not model_size.endswith('.en'))
+        key = None
+        if self.cache.enabled:
+            # Retries and replays of the same audio skip the decode entirely
+            # Without a language, the result depends on what detection picks
+            key = self.cache.key(audio, initial_prompt=initial_prompt, model_size=model_size,
+                                 language=language)
+            result = self.cache.get(key)
+            if result is not None:
+                return self.vocabulary.apply_result(result)
+
+        with self._lock:
+            self._load_model()
+
+            start = time.monotonic()
+            probability = None
+            if language is None and isinstance(audio, np.ndarray):
+                # Detected separately so the caller learns how sure it was
+                detected = self._model.detect_language(audio)
+                if detected is not None:
+                    language, probability = detected
+            result = self._model.transcribe(audio, language=language, initial_prompt=initial_prompt)
+            result["language"] = result.get("language") or language
+            if probability is not None:
+                result["language_probability"] = probability
+            if isinstance(audio, np.ndarray) and audio.size >= SAMPLE_RATE:
+                # Feeds whisper.model_size: 'auto'
+                self.governor.record_rtf(self._model_key[1], self._model_key[0],
+                                         (time.monotonic() - start) / (audio.size / SAMPLE_RATE))
+            self._schedule_unload()
+
+        if key is not None:
+            # Cached before replacements, so edited rules apply to cached results too
+            self.cache.put(key, result)
+        return self.vocabulary.apply_result(result)
+
+    def _schedule_unload(self):
+        """(Re)start the countdown to unloading an unused model; call with the lock held"""
+        minutes = self.governor.settings['idle_unload_minutes']
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        if minutes:
+            self._idle_timer = threading.Timer(minutes * 60, self._unload_idle)
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    def _unload_idle(self):
+        """Free the model after resources.idle_unload_minutes without a decode"""
+        with self._lock:
+            if self._model is None:
+                return
+            key = self._model_key
+            self._model = None
+            self._model_key = None
+            # Drop the weights now rather than whenever the collector next runs
+            gc.collect()
+        print(f"Unloaded idle whisper model {key[1]}")
+        log_event('model_unload', 0.0, backend=key[0], model_size=key[1])
+        self._report(key, loaded=False)
 
     def transcribe(self, audio_file: str) -> str:
         """
         Transcribe the given audio file to text
-        
+
         Args:
             audio_file: Path to the audio file to transcribe
-            
+
+        Returns:
+            Transcribed text
+        """
+        return self._decode(audio_file)["text"].strip()
+
+    def transcribe_array(self, audio: np.ndarray) -> str:
+        """
+        Transcribe an in-memory recording without going through ffmpeg
+
+        Args:
+            audio: Mono float32 samples at 16 kHz, as returned by
+                AudioRecorder.stop_recording
+
         Returns:
             Transcribed text
         """
-        self._load_model()  # Ensure model is loaded with current config
-        
-        result = self._model.transcribe(
-            audio_file,
-            language=self.config.whisper['language'] or None,
-            fp16=False  # Use CPU-friendly settings
+        if audio.size == 0:
+            return ""
+        return self.transcribe_segments(audio)["text"].strip()
+
+    def transcribe_segments(self, audio: np.ndarray, initial_prompt: Optional[str] = None,
+                            language: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Transcribe an in-memory recording and keep Whisper's segment timing
+
+        Args:
+            audio: Mono float32 samples at 16 kHz
+            initial_prompt: Text preceding this audio, used as decoding context
+            language: Decode in this language instead of whisper.language;
+                with neither set it is detected
+
+        Returns:
+            Whisper result dict with "text", "segments" (start/end in seconds
+            relative to the start of audio) and "language", plus
+            "language_probability" when the language was detected
+        """
+        if audio.size == 0:
+            return {"text": "", "segments": []}
+        return self._decode(
+            np.ascontiguousarray(audio, dtype=np.float32),
+            initial_prompt=initial_prompt or None,
+            language=language
         )
-        
-        return result["text"].strip()
 
     def reload_model(self):
         """Force reload the model (e.g., after config change)"""
-        self._model = None
-        self._load_model() 
\ No newline at end of file
+        self._swap_model()
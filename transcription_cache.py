@@ -0,0 +1,154 @@
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+from config_loader import Config
+
+
+class TranscriptionCache:
+    """
+    Content-addressed store of Whisper results.
+
+    Keys hash the PCM samples (or the file contents) together with every
+    setting that changes the output: backend, model size, compute type,
+    language, beam size and the initial prompt. Results live in an in-memory
+    LRU and, if cache.disk is set, in a SQLite file that evicts the least
+    recently used entries once it exceeds cache.max_disk_mb.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.config.cache
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings['enabled']
+
+    def key(self, audio: Union[str, np.ndarray], **options) -> str:
+        """Fingerprint of the audio plus the decoding parameters"""
+        digest = hashlib.blake2b(digest_size=20)
+        if isinstance(audio, np.ndarray):
+            digest.update(np.ascontiguousarray(audio, dtype=np.float32).data)
+        else:
+            with open(audio, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        whisper = self.config.whisper
+        params = {
+            'backend': whisper['backend'],
+            'model_size': whisper['model_size'],
+            'compute_type': whisper['compute_type'],
+            'beam_size': whisper['beam_size'],
+            'language': whisper['language'] or None,
+            **options
+        }
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+            elif self.settings['disk']:
+                result = self._disk_get(key)
+                if result is not None:
+                    self._remember(key, result)
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Callers may modify what they get back
+            return copy.deepcopy(result)
+
+    def put(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            result = copy.deepcopy(result)
+            self._remember(key, result)
+            if self.settings['disk']:
+                self._disk_put(key, result)
+
+    def _remember(self, key: str, result: Dict[str, Any]):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.settings['memory_entries']:
+            self._memory.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            path = Path(os.path.expanduser(self.settings['path']))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Guarded by self._lock, so one connection can serve every thread
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, result TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            db = self._connect()
+            row = db.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            with db:
+                db.execute('UPDATE results SET used = ? WHERE key = ?', (time.time(), key))
+            return json.loads(row[0])
+        except (sqlite3.Error, OSError) as e:
+            print(f"Transcription cache read failed: {e}")
+            return None
+
+    def _disk_put(self, key: str, result: Dict[str, Any]):
+        # numpy scalars sneak into some backends' segment data
+        data = json.dumps(result, default=float)
+        try:
+            db = self._connect()
+            with db:
+                db.execute(
+                    'INSERT OR REPLACE INTO results (key, result, size, used) VALUES (?, ?, ?, ?)',
+                    (key, data, len(data), time.time())
+                )
+                self._evict(db)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Transcription cache write failed: {e}")
+
+    def _evict(self, db: sqlite3.Connection):
+        """Drop least recently used rows until the store fits in max_disk_mb"""
+        budget = self.settings['max_disk_mb'] * 1024 * 1024
+        total = db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= budget:
+            return
+        excess = total - budget
+        for key, size in db.execute('SELECT key, size FROM results ORDER BY used').fetchall():
+            db.execute('DELETE FROM results WHERE key = ?', (key,))
+            excess -= size
+            if excess <= 0:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.settings['disk']:
+                try:
+                    db = self._connect()
+                    with db:
+                        db.execute('DELETE FROM results')
+                except (sqlite3.Error, OSError) as e:
+                    print(f"Transcription cache clear failed: {e}")
@@ -0,0 +1,197 @@
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from typing import Any, Dict, Optional
+from config_loader import Config
+
+# Lower numbers are decoded first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+# Transcriber methods a job may call inside the worker process
+_ALLOWED_METHODS = ('transcribe', 'transcribe_array', 'transcribe_segments', 'reload_model', 'reload_config')
+
+
+def _worker_main(jobs, results, ready, model_size):
+    """Entry point of the worker process: load the model once, then serve jobs forever"""
+    # Imported here so only the worker process pays for torch/whisper
+    from transcriber import Transcriber
+
+    transcriber = Transcriber(model_size=model_size)
+    ready.set()
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, method, args, kwargs = job
+        try:
+            if method == 'reload_config':
+                # This process has its own Config; reread the file, then swap the model in the background
+                Config().reload()
+                results.put((job_id, transcriber.apply_config(), None))
+                continue
+            results.put((job_id, getattr(transcriber, method)(*args, **kwargs), None))
+        except Exception as e:
+            results.put((job_id, None, f"{type(e).__name__}: {e}"))
+
+
+class TranscriptionWorker:
+    """
+    Run the Transcriber in a long-lived child process.
+
+    Jobs are queued in this process by priority and handed to the child one at
+    a time, so the Whisper model stays warm between recordings and a decode
+    never blocks the caller's thread. If the child dies, the job it was working
+    on fails and a fresh process is started for the rest of the queue.
+
+    The blocking transcribe* methods mirror Transcriber, so this class can be
+    used anywhere a Transcriber is expected.
+    """
+
+    def __init__(self, model_size: Optional[str] = None):
+        """
+        Args:
+            model_size: Passed on to the Transcriber in the worker process
+        """
+        self.config = Config()
+        self.model_size = model_size
+        self._context = mp.get_context('spawn')  # never fork a process that holds audio threads
+        self._pending = queue.PriorityQueue()
+        self._ids = itertools.count()
+        self._process = None
+        self._jobs = None
+        self._results = None
+        self._ready = None
+        self._closed = False
+        self._start_process()
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def _start_process(self):
+        self._jobs = self._context.Queue()
+        self._results = self._context.Queue()
+        self._ready = self._context.Event()
+        self._process = self._context.Process(
+            target=_worker_main,
+            args=(self._jobs, self._results, self._ready, self.model_size),
+            name='voxtalkinux-transcriber',
+            daemon=True
+        )
+        self._process.start()
+
+    def _restart_process(self):
+        print(f"Transcription worker exited with code {self._process.exitcode}, restarting...")
+        time.sleep(self.config.worker['restart_delay'])
+        self._start_process()
+
+    @property
+    def ready(self) -> bool:
+        """Whether the worker process has its model loaded"""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the worker process has its model loaded"""
+        return self._ready.wait(timeout)
+
+    def submit(self, method: str, *args, priority: int = PRIORITY_NORMAL, **kwargs) -> Future:
+        """
+        Queue a call to a Transcriber method in the worker process
+
+        Args:
+            method: One of transcribe, transcribe_array, transcribe_segments, reload_model
+            priority: Lower values are decoded before higher ones
+            *args, **kwargs: Passed on to the Transcriber method
+
+        Returns:
+            Future that resolves to the method's return value
+        """
+        if method not in _ALLOWED_METHODS:
+            raise ValueError(f"Unknown transcriber method: {method}")
+        if self._closed:
+            raise RuntimeError("Transcription worker is closed")
+
+        future = Future()
+        job_id = next(self._ids)
+        # job_id keeps equal priorities in submission order and is never compared past that
+        self._pending.put((priority, job_id, method, args, kwargs, future))
+        return future
+
+    def _dispatch(self):
+        while True:
+            priority, job_id, method, args, kwargs, future = self._pending.get()
+            if method is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._run_job(job_id, method, args, kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _run_job(self, job_id: int, method: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        """Hand one job to the worker process and wait for its answer"""
+        if not self._process.is_alive():
+            # Died between jobs: this one hasn't started, so it goes to a fresh process instead of failing
+            self._restart_process()
+        self._jobs.put((job_id, method, args, kwargs))
+        while True:
+            try:
+                result_id, result, error = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    self._restart_process()
+                    raise RuntimeError("Transcription worker crashed while decoding")
+                continue
+            if result_id != job_id:
+                continue  # Stale answer for a job that already failed
+            if error is not None:
+                raise RuntimeError(error)
+            return result
+
+    def transcribe(self, audio_file: str, priority: int = PRIORITY_NORMAL) -> str:
+        """Transcribe an audio file in the worker process"""
+        return self.submit('transcribe', audio_file, priority=priority).result()
+
+    def transcribe_array(self, audio: np.ndarray, priority: int = PRIORITY_NORMAL) -> str:
+        """Transcribe a 16 kHz float32 buffer in the worker process"""
+        if audio.size == 0:
+            return ""
+        return self.submit('transcribe_array', audio, priority=priority).result()
+
+    def transcribe_segments(self, audio: np.ndarray, initial_prompt: Optional[str] = None,
+                            language: Optional[str] = None,
+                            priority: int = PRIORITY_NORMAL) -> Dict[str, Any]:
+        """Transcribe a 16 kHz float32 buffer in the worker process and keep segment timing"""
+        if audio.size == 0:
+            return {"text": "", "segments": []}
+        return self.submit(
+            'transcribe_segments', audio, initial_prompt=initial_prompt, language=language,
+            priority=priority
+        ).result()
+
+    def reload_model(self):
+        """Reload the model in the worker process (e.g., after config change)"""
+        self.submit('reload_model', priority=PRIORITY_HIGH).result()
+
+    def apply_config(self):
+        """Make the worker process reread config.yaml and swap models if needed"""
+        # Don't wait: the worker answers right away and loads any new model in the background
+        self.submit('reload_config', priority=PRIORITY_HIGH)
+
+    def close(self):
+        """Stop the dispatcher and the worker process"""
+        if self._closed:
+            return
+        self._closed = True
+        # Sorts after every real job, so queued work still finishes first
+        self._pending.put((float('inf'), next(self._ids), None, (), {}, None))
+        self._dispatcher.join(timeout=5)
+        self._jobs.put(None)
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
@@ -1,24 +1,79 @@
-import tkinter as tk
-from tkinter import ttk
 import numpy as np
-from PIL import Image, ImageTk, ImageDraw
 import os
 from pathlib import Path
 import math
 import threading
 import queue
-import sounddevice as sd
+import select
+import signal
+from functools import lru_cache
+from typing import Optional
+from audio_recorder import AudioCapture, ScratchBuffer
+
+# tkinter and PIL are imported by _import_gui() the first time the window is needed
+tk = None
+Image = ImageTk = ImageDraw = None
+
+def _import_gui():
+    global tk, Image, ImageTk, ImageDraw
+    if tk is None:
+        import tkinter
+        from PIL import Image as _Image, ImageTk as _ImageTk, ImageDraw as _ImageDraw
+        tk = tkinter
+        Image, ImageTk, ImageDraw = _Image, _ImageTk, _ImageDraw
+
+# Halo, glow and core of the waveform: (line width, opacity over the background)
+WAVE_LAYERS = ((5, 0.3), (3, 0.6), (2, 1.0))
+WAVE_COLOR = '#3498db'
+WAVE_SAMPLES = 80
+# Frames per full phase cycle of the sine; about 0.12 rad per frame
+PHASE_STEPS = 52
+# Below this amplitude (pixels) the line is drawn flat and animation stops
+STATIC_AMPLITUDE = 0.5
+# Pixels of amplitude per unit of RMS level
+LEVEL_GAIN = 300
+
+def _audio_level(indata, scratch: ScratchBuffer):
+    """RMS of one block; runs on the audio thread"""
+    squares = np.multiply(indata, indata, out=scratch.like(indata))
+    return float(np.sqrt(squares.mean()))
+
+@lru_cache(maxsize=None)
+def _blend_color(color, alpha, background=(44, 62, 80)):
+    """color drawn at the given opacity over the background, as a Tk hex string"""
+    r = int(color[1:3], 16)
+    g = int(color[3:5], 16)
+    b = int(color[5:7], 16)
+    bg_r, bg_g, bg_b = background
+    r = int(r * alpha + bg_r * (1 - alpha))
+    g = int(g * alpha + bg_g * (1 - alpha))
+    b = int(b * alpha + bg_b * (1 - alpha))
+    return f'#{r:02x}{g:02x}{b:02x}'
 
 class RecordingVisualizer:
-    def __init__(self):
+    def __init__(self, capture: Optional[AudioCapture] = None):
+        # Without a shared capture the visualizer opens the device itself while shown
+        self.capture = capture or AudioCapture()
+        self._owns_capture = capture is None
+        self._capture_started = False
+        self.root = None
         self.window = None
         self.canvas = None
         self.waveform_points = []
         self.is_recording = False
         self.animation_frame = 0
+        # Set while a frame is scheduled; cleared once the waveform is at rest
+        self._animating = False
+        self._wave_items = []
         self.mic_photo = None
         self.command_queue = queue.Queue()
-        self.audio_data = queue.Queue(maxsize=10)
+        # Written to whenever a command is queued, so the GUI thread can sleep until then
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._stopped = False
+        self.levels = None
+        self._level_scratch = ScratchBuffer()
         self.message = ""
 
         self.WAVE_WIDTH = 120
@@ -26,16 +81,21 @@ class RecordingVisualizer:
         self.WAVE_POINTS = 40
         self.ANIMATION_SPEED = 30
 
+        self.icon_path = Path(__file__).parent / "assets" / "mic.png"
+
+    def _setup_gui(self):
+        """Create the Tk root on first use; must run on the main thread"""
+        if self.root is not None:
+            return
+        _import_gui()
         self.root = tk.Tk()
         self.root.withdraw()
 
-        self.icon_path = Path(__file__).parent / "assets" / "mic.png"
         if not self.icon_path.parent.exists():
             os.makedirs(self.icon_path.parent)
             self._create_default_icon(self.icon_path)
 
         self._load_mic_image()
-        self.audio_stream = None
 
     def _create_default_icon(self, icon_path):
         size = 64
@@ -83,22 +143,14 @@ class RecordingVisualizer:
             self.mic_photo = ImageTk.PhotoImage(mic_image)
 
     def _setup_audio_stream(self):
-        def audio_callback(indata, frames, time, status):
-            if status:
-                print(f"Audio status: {status}")
-            if self.is_recording:
-                audio_level = np.sqrt(np.mean(indata**2))
-                try:
-                    self.audio_data.put_nowait(audio_level)
-                except queue.Full:
-                    pass
-
-        self.audio_stream = sd.InputStream(
-            channels=1,
-            samplerate=16000,
-            callback=audio_callback
-        )
-        self.audio_stream.start()
+        # Levels come from the shared capture stream, no second device handle
+        self.levels = self.capture.subscribe('level meter', maxsize=10, transform=self._level)
+        if self._owns_capture:
+            try:
+                self.capture.start()
+                self._capture_started = True
+            except Exception as e:
+                print(f"Could not open audio input for the level meter: {e}")
 
     def _create_rounded_rectangle(self, canvas, x1, y1, x2, y2, radius, **kwargs):
         points = [
@@ -117,15 +169,25 @@ class RecordingVisualizer:
         ]
         return canvas.create_polygon(points, smooth=True, **kwargs)
 
+    def _post(self, command, args=None):
+        self.command_queue.put((command, args))
+        self._wake()
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass  # Pipe full, a wakeup is pending anyway
+
     def show(self):
-        self.command_queue.put(('show', None))
+        self._post('show')
 
     def hide(self):
-        self.command_queue.put(('hide', None))
+        self._post('hide')
 
     def set_message(self, message):
         """Queue a message update to be executed in main thread"""
-        self.command_queue.put(('message', message))
+        self._post('message', message)
 
     def _show_window(self):
         if self.window is None:
@@ -165,80 +227,103 @@ class RecordingVisualizer:
             )
 
             self.canvas.create_image(30, window_height//2 - 10, anchor='center', image=self.mic_photo)
-            self._init_waveform()
+            self._init_waveform(window_height // 2)
             self._setup_audio_stream()
             self.is_recording = True
+            self._animating = True
             self._animate_waveform()
 
     def _hide_window(self):
         if self.window:
             self.is_recording = False
-            if self.audio_stream:
-                self.audio_stream.stop()
-                self.audio_stream.close()
-                self.audio_stream = None
+            if self.levels:
+                self.capture.unsubscribe(self.levels)
+                self.levels = None
+                if self._capture_started:
+                    self.capture.stop()
+                    self._capture_started = False
             self.window.destroy()
             self.window = None
             self.canvas = None
+            self._wave_items = []
 
-    def _init_waveform(self):
+    def _init_waveform(self, base_y):
         self.current_amplitude = 0
         self.target_amplitude = 0
+        self.animation_frame = 0
+        start_x = 80
+        # One row of sine values per animation phase, so a frame is a single multiply
+        angles = np.linspace(0, 2 * math.pi, WAVE_SAMPLES, endpoint=False)
+        phases = np.linspace(0, 2 * math.pi, PHASE_STEPS, endpoint=False)
+        self._phase_table = np.sin(angles[None, :] + phases[:, None])
+        self._wave_base_y = base_y
+        # Interleaved x, y for Canvas.coords; only the y values change per frame
+        self._wave_coords = np.empty(2 * WAVE_SAMPLES)
+        self._wave_coords[0::2] = np.linspace(start_x, start_x + self.WAVE_WIDTH, WAVE_SAMPLES)
+        self._wave_coords[1::2] = base_y
+        points = self._wave_coords.tolist()
+        self._wave_items = [
+            self.canvas.create_line(
+                points,
+                smooth=True,
+                fill=_blend_color(WAVE_COLOR, alpha),
+                width=width,
+                tags='waveform',
+                capstyle=tk.ROUND,
+                joinstyle=tk.ROUND
+            )
+            for width, alpha in WAVE_LAYERS
+        ]
+
+    def _level(self, indata):
+        """Level meter transform; runs on the audio thread and restarts a resting animation"""
+        level = _audio_level(indata, self._level_scratch)
+        if not self._animating and self.is_recording and level * LEVEL_GAIN >= STATIC_AMPLITUDE:
+            self._animating = True
+            self._post('animate')
+        return level
+
+    def _draw_waveform(self, amplitude):
+        """Move the existing lines to the current frame's shape"""
+        coords = self._wave_coords
+        row = self._phase_table[self.animation_frame % PHASE_STEPS]
+        np.subtract(self._wave_base_y, amplitude * row, out=coords[1::2])
+        points = coords.tolist()
+        for item in self._wave_items:
+            self.canvas.coords(item, points)
 
     def _animate_waveform(self):
+        """Draw one frame and schedule the next; fast while loud, slower when quiet, none at rest"""
         if not self.is_recording or not self.canvas:
+            self._animating = False
             return
 
         try:
+            level = None
             try:
-                audio_level = self.audio_data.get_nowait() * 300  # <-- Amplified
-                self.target_amplitude = min(70, audio_level)  # <-- Allow more visible peaks
+                while True:  # Only the newest level matters
+                    level = self.levels.get_nowait()
             except queue.Empty:
+                pass
+            if level is not None:
+                self.target_amplitude = min(70, level * LEVEL_GAIN)  # Allow visible peaks
+            else:
                 self.target_amplitude *= 0.9
 
             self.current_amplitude = self.current_amplitude * 0.6 + self.target_amplitude * 0.4
-            self.canvas.delete('waveform')
-
-            points = []
-            start_x = 80
-            base_y = self.window.winfo_height() // 2
-            num_points = 80
-            for i in range(num_points):
-                x = start_x + (self.WAVE_WIDTH * i / (num_points - 1))
-                phase = self.animation_frame * 0.12
-                y = base_y - self.current_amplitude * math.sin(
-                    (i / num_points) * math.pi * 2 + phase
-                )
-                points.extend([x, y])
-
-            for width, alpha in [(5, 0.3), (3, 0.6), (2, 1.0)]:
-                color = self._adjust_color('#3498db', alpha)
-                self.canvas.create_line(
-                    points,
-                    smooth=True,
-                    fill=color,
-                    width=width,
-                    tags='waveform',
-                    capstyle=tk.ROUND,
-                    joinstyle=tk.ROUND
-                )
-
             self.animation_frame += 1
 
-            if self.is_recording:
-                self.window.after(self.ANIMATION_SPEED, self._animate_waveform)
-        except tk.TclError:
-            pass
+            if max(self.current_amplitude, self.target_amplitude) < STATIC_AMPLITUDE:
+                # Nothing would visibly move; rest until _level sees sound again
+                self._draw_waveform(0)
+                self._animating = False
+                return
 
-    def _adjust_color(self, color, alpha):
-        r = int(color[1:3], 16)
-        g = int(color[3:5], 16)
-        b = int(color[5:7], 16)
-        bg_r, bg_g, bg_b = 44, 62, 80
-        r = int(r * alpha + bg_r * (1 - alpha))
-        g = int(g * alpha + bg_g * (1 - alpha))
-        b = int(b * alpha + bg_b * (1 - alpha))
-        return f'#{r:02x}{g:02x}{b:02x}'
+            self._draw_waveform(self.current_amplitude)
+            interval = self.ANIMATION_SPEED if self.current_amplitude >= 4 else self.ANIMATION_SPEED * 2
+            self.window.after(interval, self._animate_waveform)
+        except tk.TclError:
+            self._animating = False
 
     def _update_message(self, message):
         """Update the message text in the window"""
@@ -247,6 +332,11 @@ class RecordingVisualizer:
             self.canvas.itemconfig(self.message_id, text=message)
 
     def process_commands(self):
+        """Run queued commands; must be called on the main thread"""
+        if self.root is None and self.command_queue.empty():
+            return  # Nothing has asked for the GUI yet
+
+        self._setup_gui()
         try:
             while True:
                 command, args = self.command_queue.get_nowait()
@@ -256,10 +346,51 @@ class RecordingVisualizer:
                     self._hide_window()
                 elif command == 'message':
                     self._update_message(args)
+                elif command == 'animate':
+                    self._animate_waveform()
         except queue.Empty:
             pass
 
+    def _drain_wakeups(self):
         try:
-            self.root.update()
-        except tk.TclError:
-            pass
\ No newline at end of file
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _on_wake(self, fd, mask):
+        self._drain_wakeups()
+        self.process_commands()
+        if self._stopped:
+            self.root.quit()
+
+    def run(self):
+        """
+        Serve GUI commands on the calling (main) thread until stop()
+
+        Sleeps in select() until the first command arrives, then hands over
+        to Tk's event loop with the wakeup pipe registered as a file handler,
+        so nothing runs between commands and animation frames.
+        """
+        # Signals write to the pipe as well, so their Python handlers run
+        # promptly instead of waiting for the next GUI event
+        signal.set_wakeup_fd(self._wake_w)
+        try:
+            while not self._stopped and self.root is None:
+                select.select([self._wake_r], [], [])
+                self._drain_wakeups()
+                self.process_commands()
+            if self._stopped:
+                return
+            self.root.createfilehandler(self._wake_r, tk.READABLE, self._on_wake)
+            try:
+                self.root.mainloop()
+            finally:
+                self.root.deletefilehandler(self._wake_r)
+        finally:
+            signal.set_wakeup_fd(-1)
+
+    def stop(self):
+        """Make run() return; safe to call from any thread"""
+        self._stopped = True
+        self._wake()
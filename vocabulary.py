@@ -0,0 +1,160 @@
+import json
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config_loader import Config
+
+# Whisper keeps at most this many prompt tokens (half its text context, minus one)
+MAX_PROMPT_TOKENS = 223
+
+
+@lru_cache(maxsize=None)
+def _tokenizer(multilingual: bool) -> Optional[Tuple[Callable[[str], List[int]], Callable[[List[int]], str]]]:
+    """(encode, decode) of Whisper's tokenizer, or None without openai-whisper"""
+    try:
+        from whisper.tokenizer import get_tokenizer
+    except ImportError:
+        return None
+    tokenizer = get_tokenizer(multilingual=multilingual)
+    return tokenizer.encode, tokenizer.decode
+
+
+def count_tokens(text: str, multilingual: bool = True) -> int:
+    tokenizer = _tokenizer(multilingual)
+    if tokenizer is None:
+        return len(text) // 3 + 1  # Rough upper estimate for English text
+    return len(tokenizer[0](text))
+
+
+def _last_tokens(text: str, budget: int, multilingual: bool) -> str:
+    """The end of text, cut to at most budget tokens"""
+    if budget <= 0:
+        return ""
+    tokenizer = _tokenizer(multilingual)
+    if tokenizer is None:
+        return text[-budget * 3:]
+    encode, decode = tokenizer
+    tokens = encode(text)
+    return text if len(tokens) <= budget else decode(tokens[-budget:]).lstrip()
+
+
+class Vocabulary:
+    """
+    Names and jargon of the active vocabulary profile.
+
+    Words bias decoding through Whisper's initial prompt: they are rendered
+    once per word list into a glossary that fits vocabulary.prompt_tokens,
+    and the running context is cut so both fit Whisper's prompt window.
+    Replacements (whole phrases, case-insensitive) and regex patterns fix
+    what the model still gets wrong; they are compiled once per profile.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self._lock = threading.Lock()
+        # (words, budget, multilingual) -> glossary text
+        self._prompts: Dict[tuple, str] = {}
+        # JSON of the rules -> compiled rules
+        self._rules: Dict[str, list] = {}
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.config.vocabulary
+
+    @property
+    def profile(self) -> Dict[str, Any]:
+        settings = self.settings
+        return (settings['profiles'] or {}).get(settings['profile']) or {}
+
+    def glossary(self, multilingual: bool = True) -> str:
+        """Prompt text for the profile's words, cut to the token budget; cached"""
+        words = tuple(dict.fromkeys(str(word) for word in self.profile.get('words') or ()))
+        budget = min(self.settings['prompt_tokens'], MAX_PROMPT_TOKENS)
+        key = (words, budget, multilingual)
+        with self._lock:
+            if key not in self._prompts:
+                self._prompts[key] = self._render(words, budget, multilingual)
+            return self._prompts[key]
+
+    @staticmethod
+    def _render(words: Tuple[str, ...], budget: int, multilingual: bool) -> str:
+        # Most important words come first, so they are the ones that fit
+        kept = []
+        for word in words:
+            candidate = "Glossary: " + ", ".join(kept + [word]) + "."
+            if count_tokens(candidate, multilingual) > budget:
+                break
+            kept.append(word)
+        return "Glossary: " + ", ".join(kept) + "." if kept else ""
+
+    def prompt(self, context: Optional[str] = None, multilingual: bool = True) -> Optional[str]:
+        """
+        Initial prompt for one decode
+
+        Args:
+            context: Text spoken just before this audio, if any
+            multilingual: False for English-only (.en) models, whose tokenizer differs
+
+        Returns:
+            Glossary followed by as much of the context as still fits, or None
+        """
+        if not self.settings['enabled']:
+            return context or None
+        glossary = self.glossary(multilingual)
+        if not glossary:
+            return context or None
+        if not context:
+            return glossary
+        remaining = MAX_PROMPT_TOKENS - count_tokens(glossary, multilingual) - 1
+        return f"{glossary} {_last_tokens(context, remaining, multilingual)}".strip()
+
+    def _compiled(self) -> list:
+        profile = self.profile
+        replacements = profile.get('replacements') or {}
+        patterns = profile.get('patterns') or []
+        key = json.dumps([replacements, patterns], sort_keys=True)
+        with self._lock:
+            if key not in self._rules:
+                rules = []
+                if replacements:
+                    lookup = {str(spoken).lower(): str(written) for spoken, written in replacements.items()}
+                    # Longest first, so "vox talk linux" wins over "vox talk"
+                    phrases = sorted(lookup, key=len, reverse=True)
+                    regex = re.compile(
+                        r'(?<!\w)(?:' + '|'.join(re.escape(p) for p in phrases) + r')(?!\w)',
+                        re.IGNORECASE
+                    )
+                    rules.append((regex, lambda m, lookup=lookup: lookup[m.group(0).lower()]))
+                for rule in patterns:
+                    # validate() rejects these, but an override() isn't validated
+                    try:
+                        if not isinstance(rule, (list, tuple)):
+                            raise TypeError("not a [regex, replacement] pair")
+                        pattern, replacement = rule
+                        rules.append((re.compile(pattern), replacement))
+                    except (TypeError, ValueError, re.error) as e:
+                        print(f"Skipping vocabulary pattern {rule!r}: {e}")
+                self._rules[key] = rules
+            return self._rules[key]
+
+    def apply(self, text: str) -> str:
+        """Apply the profile's replacements and patterns to decoded text"""
+        if not self.settings['enabled'] or not text:
+            return text
+        for regex, replacement in self._compiled():
+            try:
+                text = regex.sub(replacement, text)
+            except (re.error, IndexError) as e:
+                # e.g. a replacement referring to a group the pattern doesn't have
+                print(f"Skipping vocabulary pattern {regex.pattern!r}: {e}")
+        return text
+
+    def apply_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """apply() to a Whisper result's text and every segment, in place"""
+        if not self.settings['enabled'] or not self._compiled():
+            return result
+        result["text"] = self.apply(result["text"])
+        for segment in result.get("segments") or ():
+            segment["text"] = self.apply(segment["text"])
+        return result
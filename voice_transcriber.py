@@ -4,12 +4,20 @@ import os
 import sys
 import signal
 import subprocess
-from pathlib import Path
 from pynput import keyboard
 from config_loader import Config
-from audio_recorder import AudioRecorder
-from transcriber import Transcriber
+from config_watcher import ConfigWatcher
+from audio_recorder import AudioCapture, AudioRecorder, WHISPER_SAMPLE_RATE
+from transcriber import Transcriber, CONFIG_SECTIONS
+from transcription_worker import TranscriptionWorker
+from streaming_transcriber import StreamingTranscriber
+from parallel_transcriber import ParallelTranscriber
 from output_handler import OutputHandler
+from history import DictationHistory
+from language import LanguageSelector
+from socket_api import SocketAPI
+from latency import LatencyLog
+from pipeline import Pipeline, State
 from visualization import RecordingVisualizer
 import threading
 import time
@@ -18,23 +26,56 @@ class VoiceTranscriber:
     def __init__(self):
         print("Initializing Voice Transcriber...")  # Debug
         self.config = Config()
-        self.recorder = AudioRecorder()
-        self.transcriber = Transcriber()
+        # One input stream shared by the recorder, VAD and level meter
+        self.capture = AudioCapture()
+        self.recorder = AudioRecorder(self.capture)
+        fast_start = self.config.startup['fast_start']
+        if self.config.worker['enabled']:
+            # Decode in a separate process so the model stays warm and crashes are contained
+            self.transcriber = TranscriptionWorker()
+            if not fast_start:
+                self.transcriber.wait_ready()
+        else:
+            # With fast_start the model loads in the background; recordings made
+            # before it is ready simply wait for it in _process_recording
+            self.transcriber = Transcriber(background=fast_start)
+        self._draft_transcriber = None
+        self._draft_model = None
+        # Long recordings are split and decoded across cores instead
+        self.long_form = ParallelTranscriber(self.recorder.vad)
         self.output_handler = OutputHandler()
-        self.visualizer = RecordingVisualizer()
-        self.is_recording = False
+        self.history = DictationHistory()
+        self.languages = LanguageSelector()
+        self.latency = LatencyLog()
+        self.visualizer = RecordingVisualizer(self.capture)
+        # StreamingTranscriber of the recording in progress, if streaming
+        self.streamer = None
+        self.recorder.on_timeout = self._on_silence_timeout
+        self.recorder.warm_up()
+        self.pipeline = Pipeline(
+            start=self._start_recording,
+            stop=self._stop_recording,
+            discard=self._discard_recording,
+            process=self._process_job,
+            debounce=self.config.hotkey['debounce']
+        )
         self.running = True
         print("Loading configuration...")  # Debug
         print(f"Hotkey config: {self.config.hotkey}")  # Debug
         self._setup_hotkey()
+        self.config.add_listener(self._on_config_change)
+        self.config_watcher = ConfigWatcher()
+        # Lets other local programs use the warm model instead of loading their own
+        self.api = SocketAPI(self.transcriber, self.recorder.vad, self.long_form)
         # Show startup notification only for initial launch
         self._show_notification("Voice Transcriber Started", "Press Ctrl+Alt+Space to start/stop recording")
         print("Initialization complete!")  # Debug
 
     def _show_notification(self, title: str, message: str):
-        """Show a desktop notification - only used for startup/shutdown"""
+        """Show a desktop notification - only used for startup/shutdown and language switches"""
         try:
-            subprocess.run([
+            # Don't wait for the notification daemon, startup shouldn't depend on it
+            subprocess.Popen([
                 'notify-send',
                 title,
                 message,
@@ -49,78 +90,337 @@ class VoiceTranscriber:
         hotkey = self.config.hotkey
         print(f"Setting up hotkey with config: {hotkey}")  # Debug
         
-        # Convert modifier strings to actual Key objects
-        modifiers = set()
-        for mod in hotkey['modifiers']:
-            if hasattr(keyboard.Key, mod):
-                modifiers.add(getattr(keyboard.Key, mod))
-                print(f"Added modifier: {mod} -> {getattr(keyboard.Key, mod)}")  # Debug
-            else:
-                key_code = keyboard.KeyCode.from_char(mod)
-                modifiers.add(key_code)
-                print(f"Added modifier as char: {mod} -> {key_code}")  # Debug
+        modifiers = {self._parse_key(mod) for mod in hotkey['modifiers']}
+        key = self._parse_key(hotkey['key'])
+        cancel_key = self._parse_key(hotkey['cancel_key']) if hotkey['cancel_key'] else None
+        repeat_key = self._parse_key(hotkey['repeat_key']) if hotkey['repeat_key'] else None
+        language_keys = {
+            self._parse_key(profile['key']): i
+            for i, profile in enumerate(self.languages.profiles) if profile.get('key')
+        }
+        print(f"Target key: {hotkey['key']} -> {key}, modifiers: {modifiers}, cancel: {cancel_key}")  # Debug
 
-        # Convert key to actual Key object
-        if hasattr(keyboard.Key, hotkey['key']):
-            key = getattr(keyboard.Key, hotkey['key'])
-        else:
-            key = keyboard.KeyCode.from_char(hotkey['key'])
-        print(f"Target key: {hotkey['key']} -> {key}")  # Debug
-        
         self.current_keys = set()
-        
+        # Set while the combination is held, so auto-repeat doesn't toggle again
+        held = threading.Event()
+        repeat_held = threading.Event()
+        language_held = threading.Event()
+
+        # These run on the listener thread: only post events, never block it
         def on_press(k):
-            # print(f"Key pressed: {k}")  # Debug
             self.current_keys.add(k)
-            # print(f"Current keys held: {self.current_keys}")  # Debug
-            # print(f"Looking for modifiers: {modifiers} and key: {key}")  # Debug
-            if all(m in self.current_keys for m in modifiers) and key in self.current_keys:
-                print("Hotkey combination detected!")  # Debug
-                self.toggle_recording()
+            self.output_handler.note_key_press()
+            # With the modifiers, like the other keys: a bare Esc meant for another window must not cancel
+            if (k == cancel_key and all(m in self.current_keys for m in modifiers)
+                    and self.pipeline.state != State.IDLE):
+                self.pipeline.post('cancel')
+            elif key in self.current_keys and all(m in self.current_keys for m in modifiers):
+                if not held.is_set():
+                    held.set()
+                    print("Hotkey combination detected!")  # Debug
+                    self.pipeline.post('toggle')
+            elif repeat_key in self.current_keys and all(m in self.current_keys for m in modifiers):
+                if not repeat_held.is_set():
+                    repeat_held.set()
+                    self.pipeline.submit(self.config.history['repeat_last'], kind='repeat')
+            elif k in language_keys and all(m in self.current_keys for m in modifiers):
+                if not language_held.is_set():
+                    language_held.set()
+                    message = self.languages.select(language_keys[k])
+                    print(message)
+                    self._show_notification("Voice Transcriber", message)
 
         def on_release(k):
-            try:
-                self.current_keys.remove(k)
-                # print(f"Key released: {k}")  # Debug
-                # print(f"Current keys held: {self.current_keys}")  # Debug
-            except KeyError:
-                pass
+            self.current_keys.discard(k)
+            if k == key or k in modifiers:
+                held.clear()
+            if k == repeat_key or k in modifiers:
+                repeat_held.clear()
+            if k in language_keys or k in modifiers:
+                language_held.clear()
 
         self.listener = keyboard.Listener(on_press=on_press, on_release=on_release)
 
+    @staticmethod
+    def _parse_key(name: str):
+        """pynput key for a config name: a Key attribute such as 'ctrl', or a character"""
+        if hasattr(keyboard.Key, name):
+            return getattr(keyboard.Key, name)
+        return keyboard.KeyCode.from_char(name)
+
     def toggle_recording(self):
-        """Toggle recording state"""
-        if not self.is_recording:
-            print("Starting recording...")
-            self.visualizer.show()  # Show visualization window
-            self.visualizer.set_message("Speak now...")
-            self.recorder.start_recording()
-            self.is_recording = True
+        """Start or stop recording; handled asynchronously by the pipeline"""
+        self.pipeline.post('toggle')
+
+    def _start_recording(self):
+        print("Starting recording...")
+        self.visualizer.show()  # Show visualization window
+        self.visualizer.set_message("Speak now...")
+        trace = self.latency.new_trace()
+        trace.fields['model_size'] = self.config.whisper['model_size']
+        self.recorder.trace = trace
+        self._capture_started = time.monotonic()
+        self.streamer = None
+        self.recorder.start_recording()
+        if self.config.streaming['enabled']:
+            # A fresh one per recording: the previous one may still be waiting for its job to finish
+            self.streamer = StreamingTranscriber(
+                self.transcriber, self.recorder, on_update=self._on_partial_transcript,
+                languages=self.languages
+            )
+            self.streamer.start()
+
+    def _stop_recording(self):
+        """Stop capturing; returns the job payload for the processing thread, or None"""
+        print("Stopping recording...")
+        self.visualizer.set_message("Processing speech...")
+        trace = self.recorder.trace
+        trace.add('capture', self._capture_started, time.monotonic())
+        streamer, self.streamer = self.streamer, None
+        if streamer is not None:
+            # No passes over audio captured after this point
+            streamer.stop()
+        audio = self.recorder.stop_recording()
+        self.recorder.trace = None
+        if audio is None:
+            self._hide_overlay()
+            return None
+        return audio, streamer, trace
+
+    def _discard_recording(self):
+        self.recorder.stop_recording()
+        self.recorder.trace = None
+        streamer, self.streamer = self.streamer, None
+        if streamer is not None:
+            streamer.stop()
+        self._hide_overlay()
+
+    def _status(self, message: str):
+        # A recording started meanwhile owns the overlay
+        if not self.pipeline.recording:
+            self.visualizer.set_message(message)
+
+    def _hide_overlay(self):
+        if not self.pipeline.recording:
+            self.visualizer.hide()
+
+    def _process_job(self, job):
+        if job.kind == 'repeat':
+            self._repeat_output(job.payload)
+        else:
+            self._process_recording(job)
+
+    def _repeat_output(self, count):
+        """Output the last count dictations again, straight from the history"""
+        if not self.history.enabled:
+            return
+        try:
+            entries = self.history.last(count)
+        except Exception as e:
+            print(f"Could not read the history: {e}")
+            return
+        if not entries:
+            print("Nothing in the history to output")
+            return
+        text = " ".join(entry['text'] for entry in reversed(entries))
+        print(f"Repeating: {text}")
+        self.output_handler.output_text(text)
+
+    def _process_recording(self, job):
+        """Transcribe a finished recording and output the text; runs on the pipeline's processing thread"""
+        audio, streamer, trace = job.payload
+        streaming = streamer is not None
+        if self.pipeline.pending:
+            trace.fields['queued_behind'] = self.pipeline.pending
+        if not self.transcriber.ready:
+            print("Waiting for the model to finish loading...")  # Debug
+            self._status("Loading model...")
+        else:
+            print("Transcribing...")
+            self._status("Transcribing...")
+        audio_seconds = round(audio.size / WHISPER_SAMPLE_RATE, 3)
+        tiering = self.config.tiering
+        # Long recordings get a fast draft now and the model_size result later
+        tiered = not streaming and tiering['enabled'] and audio_seconds >= tiering['min_seconds']
+        try:
+            with trace.span('decode', audio_seconds=audio_seconds, streaming=streaming,
+                            tier='draft' if tiered else 'main'):
+                if streaming:
+                    # Most of the recording is already committed, only the tail is left
+                    text = streamer.finish(audio)
+                elif tiered:
+                    text = self._transcribe(audio, self.draft_transcriber)
+                else:
+                    text = self._transcribe(audio)
+        except Exception as e:
+            print(f"Transcription failed: {e}")
+            trace.fields['error'] = str(e)
+            self.latency.record(trace)
+            self._hide_overlay()
+            return
+        print(f"Transcribed text: {text}")
+
+        if job.cancelled.is_set():
+            trace.fields['cancelled'] = True
+            self.latency.record(trace)
+            self._hide_overlay()
+            return
+
+        print("Processing output...")
+        self.pipeline.advance(job, State.OUTPUTTING)
+        self._status("Typing text...")
+        success = self.output_handler.output_text(text, trace=trace)
+        trace.fields['chars'] = len(text)
+        trace.fields['output_ok'] = success
+
+        # Hide visualization after a short delay
+        time.sleep(0.5)
+        self._hide_overlay()
+
+        # Upgrading here rather than on another thread keeps the corrected
+        # text ahead of the next recording's output
+        if tiered and not job.cancelled.is_set():
+            self.pipeline.advance(job, State.TRANSCRIBING)
+            text = self._upgrade_draft(job, audio, text, trace)
+
+        # Kept even when output failed, so it can be repeated instead of dictated again
+        with trace.span('history'):
+            self.history.record(
+                text, audio,
+                window_class=(self.output_handler.last_typed or (None, None))[1],
+                model_size=trace.fields.get('model_size'),
+                audio_seconds=audio_seconds,
+                output_ok=success
+            )
+        self.latency.record(trace)
+
+    @property
+    def draft_transcriber(self):
+        """Transcriber for tiering.draft_model, created on first use and again when it changes"""
+        draft_model = self.config.tiering['draft_model']
+        if self._draft_transcriber is not None and self._draft_model != draft_model:
+            print(f"Switching draft model to {draft_model}")
+            if isinstance(self._draft_transcriber, TranscriptionWorker):
+                self._draft_transcriber.close()
+            self._draft_transcriber = None
+        if self._draft_transcriber is None:
+            self._draft_model = draft_model
+            if self.config.worker['enabled']:
+                # Its own process, so the upgrade decode can't hold up the next draft
+                self._draft_transcriber = TranscriptionWorker(model_size=draft_model)
+            else:
+                self._draft_transcriber = Transcriber(model_size=draft_model)
+        return self._draft_transcriber
+
+    def _upgrade_draft(self, job, audio, draft, trace):
+        """
+        Re-decode with the main model and publish the result if it differs from the draft
+
+        Returns the text the user ends up with: the upgrade if published, else the draft.
+        """
+        try:
+            with trace.span('decode_upgrade', audio_seconds=round(audio.size / WHISPER_SAMPLE_RATE, 3)):
+                text = self._transcribe(audio)
+        except Exception as e:
+            print(f"Upgrade transcription failed, keeping the draft: {e}")
+            return draft
+        print(f"Upgraded text: {text}")
+        if job.cancelled.is_set() or not text or text.split() == draft.split():
+            return draft
+        self.pipeline.advance(job, State.OUTPUTTING)
+        with trace.span('output_upgrade', chars=len(text)):
+            self.output_handler.publish_correction(draft, text)
+        return text
+
+    def _transcribe(self, audio, transcriber=None):
+        """Decode a finished recording, skipping leading, trailing and long silences"""
+        language = self.languages.choose()
+        if transcriber is None and self.long_form.wants(audio):
+            return self.long_form.transcribe_array(audio, language.language)
+        transcriber = transcriber or self.transcriber
+        if self.config.vad['enabled']:
+            pieces = self.recorder.vad.decode_ranges(audio)
         else:
-            print("Stopping recording...")
-            self.visualizer.set_message("Processing speech...")
-            audio_file = self.recorder.stop_recording()
-            self.is_recording = False
-            
-            if audio_file:
-                print("Transcribing...")
-                self.visualizer.set_message("Transcribing...")
-                text = self.transcriber.transcribe(audio_file)
-                print(f"Transcribed text: {text}")
-                
-                print("Processing output...")
-                self.visualizer.set_message("Typing text...")
-                success = self.output_handler.output_text(text)
-                
-                # Clean up temporary audio file
-                try:
-                    Path(audio_file).unlink()
-                except Exception as e:
-                    print(f"Warning: Could not delete temporary file: {e}")
-                
-                # Hide visualization after a short delay
-                time.sleep(0.5)
-                self.visualizer.hide()
+            pieces = [(0, audio.size)]
+
+        texts = []
+        for start, end in pieces:
+            # Feed the previous pieces as context so the split stays invisible in the text
+            prompt = " ".join(texts)[-200:] or None
+            result = transcriber.transcribe_segments(
+                audio[start:end], initial_prompt=prompt, language=language.language
+            )
+            # Once the first piece has been detected, the rest are decoded in its language
+            language = self.languages.update(language, result)
+            text = result["text"].strip()
+            if text:
+                texts.append(text)
+        return " ".join(texts)
+
+    def _on_silence_timeout(self):
+        """Stop the recording once the speaker has been quiet for audio.timeout seconds"""
+        if self.pipeline.recording:
+            print("Silence timeout reached, stopping recording...")  # Debug
+            self.pipeline.post('timeout')
+
+    def _on_config_change(self, changed):
+        """Apply a reloaded config.yaml; output and VAD settings are read on use anyway"""
+        if changed & {'audio', 'vad'}:
+            # An open input stream still delivers the old rate and channel count
+            self.recorder.apply_config()
+        if changed & CONFIG_SECTIONS:
+            # Worker processes reread the file; a new model loads in the background if needed
+            self.transcriber.apply_config()
+            draft = self._draft_transcriber
+            if draft is not None:
+                draft.apply_config()
+        if changed & (CONFIG_SECTIONS | {'long_form'}):
+            # The pool starts again with the new settings and layout on next use
+            self.long_form.close()
+        if changed & {'whisper', 'language'}:
+            # A different model may hear a different language
+            self.languages.forget()
+        if changed & {'hotkey', 'language'}:
+            print(f"Rebinding hotkey: {self.config.hotkey}")  # Debug
+            old_listener = self.listener
+            self.pipeline.debounce = self.config.hotkey['debounce']
+            self._setup_hotkey()
+            old_listener.stop()
+            self.listener.start()
+
+    def _on_partial_transcript(self, committed: str, tentative: str):
+        """Show the running streaming hypothesis in the overlay"""
+        preview = f"{committed} {tentative}".strip()
+        if preview:
+            self.visualizer.set_message(preview[-60:])
+
+    def start_background(self):
+        """Start everything that runs beside the GUI loop: pipeline, hotkeys, config watcher, API"""
+        self.pipeline.start()
+        # The hotkey listener runs in its own thread
+        self.listener.start()
+        if self.config.reload_settings['watch']:
+            self.config_watcher.start()
+        if self.config.api['enabled']:
+            try:
+                self.api.start()
+            except OSError as e:
+                print(f"Could not start the transcription API: {e}")
+
+    def stop_background(self):
+        """Stop what start_background started and release the transcribers"""
+        self.running = False
+        self.config_watcher.stop()
+        self.api.stop()
+        self.pipeline.stop()
+        if self.pipeline.recording:
+            self.recorder.stop_recording()
+        self.listener.stop()
+        for transcriber in (self.transcriber, self._draft_transcriber):
+            if isinstance(transcriber, TranscriptionWorker):
+                transcriber.close()
+        self.long_form.close()
+        self.latency.close()
 
     def run(self):
         """Start the voice transcriber service"""
@@ -130,26 +430,18 @@ class VoiceTranscriber:
         # Handle graceful shutdown
         def signal_handler(signum, frame):
             print("\nShutting down...")
-            self.running = False
-            if self.is_recording:
-                self.recorder.stop_recording()
-            self.listener.stop()
+            self.stop_background()
             self._show_notification("Voice Transcriber", "Service stopped")
             sys.exit(0)
         
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
         
-        # Start the hotkey listener in a separate thread
-        self.listener.start()
+        self.start_background()
         
-        # Main event loop - process visualization commands and update GUI
+        # Main event loop - the GUI thread sleeps until a command or signal arrives
         try:
-            while self.running:
-                # Process any pending visualization commands
-                self.visualizer.process_commands()
-                # Small sleep to prevent high CPU usage
-                time.sleep(0.01)
+            self.visualizer.run()
         except KeyboardInterrupt:
             signal_handler(None, None)
         finally:
@@ -0,0 +1,173 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+# Each engine's package is optional and only imported when that backend is selected
+
+# whisper_sampling_strategy value for beam search; whisper.cpp ignores beam_size under greedy
+WHISPER_CPP_BEAM_SEARCH = 1
+
+
+class WhisperBackend:
+    """
+    Reference engine: openai-whisper on PyTorch.
+
+    Every backend takes a model size and the whisper config section, and
+    returns results shaped like openai-whisper's: a dict with "text",
+    "language" and "segments" (each with "start"/"end" in seconds and "text",
+    plus "avg_logprob" where the engine reports it).
+    """
+
+    name = 'whisper'
+
+    def __init__(self, model_size: str, settings: Dict[str, Any]):
+        import whisper
+        import torch
+
+        if settings['threads']:
+            torch.set_num_threads(settings['threads'])
+        self.settings = settings
+        self.model = whisper.load_model(model_size)
+
+    def transcribe(self, audio, language: Optional[str] = None,
+                   initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+        options = {}
+        if self.settings['beam_size']:
+            options['beam_size'] = self.settings['beam_size']
+        return self.model.transcribe(
+            audio,
+            language=language,
+            initial_prompt=initial_prompt,
+            fp16=False,  # Use CPU-friendly settings
+            **options
+        )
+
+    def detect_language(self, audio) -> Optional[Tuple[str, float]]:
+        """
+        Most likely language of the first 30 seconds of a 16 kHz float32 buffer
+
+        Returns:
+            (language code, probability), or None if the engine can't tell
+        """
+        import whisper
+
+        if not self.model.is_multilingual:
+            return 'en', 1.0
+        audio = whisper.pad_or_trim(audio)
+        mel = whisper.log_mel_spectrogram(audio, self.model.dims.n_mels).to(self.model.device)
+        _, probs = self.model.detect_language(mel)
+        language = max(probs, key=probs.get)
+        return language, probs[language]
+
+
+class FasterWhisperBackend(WhisperBackend):
+    """CTranslate2 engine via faster-whisper, int8-quantized on CPU by default"""
+
+    name = 'faster-whisper'
+
+    def __init__(self, model_size: str, settings: Dict[str, Any]):
+        from faster_whisper import WhisperModel
+
+        self.settings = settings
+        self.model = WhisperModel(
+            model_size,
+            device='cpu',
+            compute_type=settings['compute_type'],
+            cpu_threads=settings['threads']  # 0 lets CTranslate2 decide
+        )
+
+    def transcribe(self, audio, language: Optional[str] = None,
+                   initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+        segments, info = self.model.transcribe(
+            audio,
+            language=language,
+            initial_prompt=initial_prompt,
+            beam_size=self.settings['beam_size'] or 1
+        )
+        # faster-whisper decodes lazily, so this loop is where the work happens
+        result = _result([
+            {"start": s.start, "end": s.end, "text": s.text, "avg_logprob": s.avg_logprob}
+            for s in segments
+        ], info.language)
+        if language is None:
+            result["language_probability"] = info.language_probability
+        return result
+
+    def detect_language(self, audio) -> Optional[Tuple[str, float]]:
+        if not self.model.model.is_multilingual:
+            return 'en', 1.0
+        if not hasattr(self.model, 'detect_language'):
+            return None  # Before faster-whisper 1.1 detection only runs inside transcribe
+        language, probability, _ = self.model.detect_language(audio)
+        return language, probability
+
+
+class WhisperCppBackend(WhisperBackend):
+    """whisper.cpp engine via pywhispercpp (ggml models, quantized per model file)"""
+
+    name = 'whisper.cpp'
+
+    def __init__(self, model_size: str, settings: Dict[str, Any]):
+        from pywhispercpp.model import Model
+
+        self.settings = settings
+        options = {'print_progress': False, 'print_realtime': False}
+        if settings['threads']:
+            options['n_threads'] = settings['threads']
+        if (settings['beam_size'] or 1) > 1:
+            # The strategy is fixed when the model's parameters are created
+            options['params_sampling_strategy'] = WHISPER_CPP_BEAM_SEARCH
+        self.model = Model(model_size, **options)
+
+    def transcribe(self, audio, language: Optional[str] = None,
+                   initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+        options = {}
+        if language:
+            options['language'] = language
+        if initial_prompt:
+            options['initial_prompt'] = initial_prompt
+        if (self.settings['beam_size'] or 1) > 1:
+            options['beam_search'] = {'beam_size': self.settings['beam_size'], 'patience': -1.0}
+        if isinstance(audio, np.ndarray):
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+        segments = self.model.transcribe(audio, **options)
+        # whisper.cpp timestamps are in units of 10 ms
+        return _result([
+            {"start": s.t0 / 100, "end": s.t1 / 100, "text": s.text} for s in segments
+        ], language)
+
+    def detect_language(self, audio) -> Optional[Tuple[str, float]]:
+        try:
+            (language, probability), _ = self.model.auto_detect_language(
+                np.ascontiguousarray(audio, dtype=np.float32)
+            )
+        except Exception as e:
+            print(f"whisper.cpp language detection failed: {e}")
+            return None
+        return language, probability
+
+
+def _result(segments: List[Dict[str, Any]], language: Optional[str] = None) -> Dict[str, Any]:
+    return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": language}
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (WhisperBackend, FasterWhisperBackend, WhisperCppBackend)
+}
+
+
+def load_backend(name: str, model_size: str, settings: Dict[str, Any]) -> WhisperBackend:
+    """
+    Load a model with the named engine
+
+    Args:
+        name: One of BACKENDS (whisper, faster-whisper, whisper.cpp)
+        model_size: Model name understood by that engine (tiny, base, small, ...)
+        settings: The whisper config section (beam_size, compute_type, threads)
+
+    Returns:
+        Backend instance with the model loaded
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown whisper backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](model_size, settings)